@@ -2,12 +2,49 @@
 // Simple interactive swimlane using D3
 // Expects data: { lanes: {Leader: [{name, ms}], Network: [...], Follower: [...], Video: [...]}, totals: {...}, overall: number }
 
-const scenarios = ["Best", "Typical", "Worst"]; // can add Selected later if needed
+// Data: data/manifest.json names a content-hashed bundle with all scenarios (src/build_json_from_excel.py).
+// Only the manifest is revalidated; the bundle is kept in localStorage until its hash changes.
+const BUNDLE_KEY = "latency-bundle";
+let bundlePromise = null;
+
+async function fetchBundle(manifest) {
+  const url = `data/${manifest.bundle}`;
+  if (window.DecompressionStream) {
+    const gz = await fetch(url + ".gz");
+    if (gz.ok) return await new Response(gz.body.pipeThrough(new DecompressionStream("gzip"))).json();
+  }
+  const resp = await fetch(url);
+  if (!resp.ok) throw new Error("Failed to load " + url);
+  return await resp.json();
+}
+
+async function loadBundle() {
+  const resp = await fetch("data/manifest.json", { cache: "no-cache" });
+  if (!resp.ok) throw new Error("Failed to load data/manifest.json");
+  const manifest = await resp.json();
+  try {
+    const cached = JSON.parse(localStorage.getItem(BUNDLE_KEY));
+    if (cached && cached.hash === manifest.hash) return cached.bundle;
+  } catch (e) { /* storage unavailable or corrupt: refetch */ }
+  const bundle = await fetchBundle(manifest);
+  try { localStorage.setItem(BUNDLE_KEY, JSON.stringify({ hash: manifest.hash, bundle })); } catch (e) {}
+  return bundle;
+}
+
+function getBundle() {
+  if (!bundlePromise) bundlePromise = loadBundle().catch(err => { bundlePromise = null; throw err; });
+  return bundlePromise;
+}
 
+// Same shape as before: { lanes: {lane: [{name, ms, color, pct}]}, totals, overall, diff }
 async function loadData(scenario) {
-  const resp = await fetch(`data/latency_${scenario}.json`);
-  if (!resp.ok) throw new Error("Failed to load data for " + scenario);
-  return await resp.json();
+  const b = await getBundle();
+  if (!b.ms[scenario]) throw new Error("No data for " + scenario);
+  const lanes = {};
+  Object.entries(b.stages).forEach(([lane, stages]) => {
+    lanes[lane] = stages.map(([name, color], i) => ({ name, color, ms: b.ms[scenario][lane][i], pct: b.pct[scenario][lane][i] }));
+  });
+  return { lanes, totals: b.totals[scenario], overall: b.overall[scenario], diff: b.diff && b.diff[scenario] };
 }
 
 
@@ -98,7 +135,9 @@ function render(data) {
         .attr("stroke", th.boxStroke)
         .on("mouseover", (event) => {
           tooltip.transition().duration(150).style("opacity", 0.95);
-          tooltip.html(`<strong>${s.name}</strong><br>${s.ms.toFixed(1)} ms`)
+          const d = data.diff ? data.diff.ms[lane][i] : null;
+          tooltip.html(`<strong>${s.name}</strong><br>${s.ms.toFixed(1)} ms (${s.pct.toFixed(1)}%)` +
+                       (d === null ? "" : `<br>${d >= 0 ? "+" : ""}${d.toFixed(1)} ms vs Typical`))
             .style("left", (event.pageX + 12) + "px")
             .style("top", (event.pageY + 12) + "px");
         })
@@ -153,15 +192,16 @@ function applyScenario(scenario) {
 
 document.addEventListener("DOMContentLoaded", () => {
   const sel = document.getElementById("scenario");
-  scenarios.forEach(s => {
-    const opt = document.createElement("option");
-    opt.value = s; opt.textContent = s;
-    sel.appendChild(opt);
-  });
-  sel.value = "Typical";
   sel.addEventListener("change", () => applyScenario(sel.value));
-
-  applyScenario("Typical");
+  getBundle().then(b => {
+    b.scenarios.forEach(s => {
+      const opt = document.createElement("option");
+      opt.value = s; opt.textContent = s;
+      sel.appendChild(opt);
+    });
+    sel.value = b.scenarios.includes("Typical") ? "Typical" : b.scenarios[0];
+    applyScenario(sel.value);
+  }).catch(err => applyScenario("Typical"));
 });
 
 
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Cost-aware latency budget optimizer: "what should we fix first" for a Command→Photon target.
+
+Every parameter can be set to its Best, Typical (status quo) or Worst value; moving one to
+Best costs the weight of its "Cost Type" (Config < Software < Hardware < Infra). For the
+typical latency the search returns the cheapest set of changes that meets the budget.
+
+Parameters that share a stage formula (e.g. payload size and baud rate) form a group; the
+model is additive across groups. All options of all groups are evaluated as columns of one
+batched model run, then combined group by group keeping only the Pareto front of
+(cost, latency) and dropping partial solutions that can no longer reach the target.
+
+For a percentile target (--metric p95) the result is a heuristic: the front of *typical*
+latency is walked in cost order and each candidate is checked with the Monte Carlo model.
+Sets off that front (e.g. a change that narrows the spread but not Typical) are never tried,
+so a cheaper set may exist. A changed parameter keeps its spread: its Best/Typical/Worst
+range is rescaled so the new value becomes its Typical (shifted instead when Typical is 0).
+
+Usage:
+  python src/budget_from_excel.py examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx --budget 150 --metric p95
+"""
+import argparse, itertools, json, re
+from pathlib import Path
+import numpy as np
+from latency_cache import load_inputs
+from latency_model import PARAMS, STAGE_PARAMS, check_inputs, param_cost, stage_values, lane_totals
+
+COST_WEIGHT = {"Config": 1, "Software": 2, "Hardware": 4, "Infra": 8}
+LEVELS = ["Typical", "Best", "Worst"]
+LEVEL_COL = {"Best":"best", "Typical":"typical", "Worst":"worst"}
+METRIC_RE = re.compile(r"^(typical|p\d+(\.\d+)?)$")
+
+def metric_pct(metric):
+    """None for "typical", the percentile for "pNN"; ValueError otherwise."""
+    m = METRIC_RE.match(metric)
+    if not m or (metric != "typical" and not 0 < float(metric[1:]) < 100):
+        raise ValueError(f"metric must be 'typical' or pNN with 0 < NN < 100, got {metric!r}")
+    return None if metric == "typical" else float(metric[1:])
+
+def metric_arg(s):
+    try:
+        metric_pct(s)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return s
+
+def param_groups(inputs):
+    """Connected components of parameters that appear together in a stage (fixed params left out)."""
+    varying = [n for n in PARAMS if len(set(inputs.loc[n, ["best", "typical", "worst"]])) > 1]
+    parent = {n: n for n in varying}
+    def find(n):
+        while parent[n] != n: n = parent[n]
+        return n
+    for names in STAGE_PARAMS:
+        names = [n for n in names if n in parent]
+        for a, b in zip(names, names[1:]):
+            parent[find(a)] = find(b)
+    groups = {}
+    for n in varying:
+        groups.setdefault(find(n), []).append(n)
+    return list(groups.values())
+
+def group_options(inputs, groups):
+    """Per group: (levels tuple per option, cost array, latency delta array) from one batched run."""
+    index = {n: k for k, n in enumerate(PARAMS)}
+    typ = inputs.loc[PARAMS, "typical"].to_numpy(dtype=float)
+    combos = []
+    for g in groups:
+        opts = []
+        for levels in itertools.product(LEVELS, repeat=len(g)):
+            vals = [inputs.loc[n, LEVEL_COL[lv]] for n, lv in zip(g, levels)]
+            # skip options that only differ by a level with the same value as Typical
+            if any(lv != "Typical" and v == inputs.loc[n, "typical"] for n, lv, v in zip(g, levels, vals)): continue
+            opts.append((levels, vals))
+        combos.append(opts)
+    X = np.repeat(typ[:, None], 1 + sum(len(o) for o in combos), axis=1)
+    col = 1
+    for g, opts in zip(groups, combos):
+        for _, vals in opts:
+            X[[index[n] for n in g], col] = vals
+            col += 1
+    overall = sum(lane_totals(stage_values(lambda n: X[index[n]])).values())
+    out, col = [], 1
+    for g, opts in zip(groups, combos):
+        delta = overall[col:col + len(opts)] - overall[0]
+        cost = np.array([sum(COST_WEIGHT.get(param_cost(inputs, n), 1) for n, lv in zip(g, levels) if lv == "Best")
+                         for levels, _ in opts], dtype=np.int64)
+        out.append(([levels for levels, _ in opts], cost, delta))
+        col += len(opts)
+    return float(overall[0]), out
+
+def pareto_front(base, options, target=None):
+    """Combine groups keeping non-dominated (cost, latency); returns arrays cost, latency, choice[n, groups]."""
+    cost = np.zeros(1, dtype=np.int64)
+    lat = np.array([base])
+    choice = np.zeros((1, 0), dtype=np.int64)
+    best_rest = np.cumsum([d.min() for _, _, d in options][::-1])[::-1].tolist() + [0.0]
+    for gi, (_, c, d) in enumerate(options):
+        cost = (cost[:, None] + c[None, :]).ravel()
+        lat = (lat[:, None] + d[None, :]).ravel()
+        choice = np.hstack([np.repeat(choice, len(c), axis=0), np.tile(np.arange(len(c)), choice.shape[0])[:, None]])
+        keep = np.ones(len(cost), dtype=bool) if target is None else lat + best_rest[gi + 1] <= target + 1e-9
+        order = np.lexsort((lat[keep], cost[keep]))
+        idx = np.flatnonzero(keep)[order]
+        front = lat[idx] < np.concatenate([[np.inf], np.minimum.accumulate(lat[idx])[:-1]]) - 1e-9
+        idx = idx[front]
+        cost, lat, choice = cost[idx], lat[idx], choice[idx]
+    return cost, lat, choice
+
+def describe(inputs, groups, options, choice):
+    changes = []
+    for g, (levels, _, _), ci in zip(groups, options, choice):
+        for n, lv in zip(g, levels[ci]):
+            if lv == "Typical": continue
+            cost = param_cost(inputs, n)
+            changes.append({"param": n, "cost": cost, "to": lv,
+                            "from_value": float(inputs.loc[n, "typical"]), "to_value": float(inputs.loc[n, LEVEL_COL[lv]])})
+    rank = {c: i for i, c in enumerate(COST_WEIGHT)}
+    changes.sort(key=lambda ch: (rank.get(ch["cost"], len(rank)), ch["param"]))
+    return changes
+
+def moved_range(inputs, ch):
+    """Best/Typical/Worst of a changed parameter: the old range moved so Typical is the new value."""
+    vals = inputs.loc[ch["param"], ["best", "typical", "worst"]].to_numpy(dtype=float)
+    typ, to = vals[1], ch["to_value"]
+    vals = vals * (to / typ) if typ else vals + (to - typ)
+    return np.maximum(vals, 0.0)
+
+def percentile_ms(inputs, changes, pct, samples, seed):
+    from montecarlo_from_excel import simulate
+    moved = inputs.copy()
+    for ch in changes:
+        moved.loc[ch["param"], ["best", "typical", "worst"]] = moved_range(inputs, ch)
+    return simulate(moved, samples, seed=seed, percentiles=(pct,))["overall"][f"p{pct:g}"]
+
+def optimize(inputs, budget, metric="typical", samples=200_000, seed=0):
+    """Changes meeting `budget` ms on `metric`: cheapest for "typical", a typical-front heuristic for "pNN"."""
+    pct = metric_pct(metric)
+    check_inputs(inputs, ["Best", "Typical", "Worst"])
+    groups = param_groups(inputs)
+    base, options = group_options(inputs, groups)
+    point = pct is None
+    cost, lat, choice = pareto_front(base, options, budget if point else None)
+    result = {"budget_ms": budget, "metric": metric, "search": "exact" if point else "typical-front heuristic",
+              "typical_ms": round(base, 3), "front_size": int(len(cost))}
+    for k in range(len(cost)):
+        changes = describe(inputs, groups, options, choice[k])
+        value = float(lat[k]) if point else percentile_ms(inputs, changes, pct, samples, seed)
+        if value <= budget:
+            result.update({"feasible": True, "cost": int(cost[k]), "ms": round(value, 3),
+                           "typical_after_ms": round(float(lat[k]), 3), "changes": changes})
+            return result
+    result.update({"feasible": False, "changes": []})
+    return result
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("excel", nargs="?", default="examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
+    ap.add_argument("--budget", type=float, required=True, help="Command→Photon target (ms)")
+    ap.add_argument("--metric", type=metric_arg, default="typical", help="'typical' or a percentile such as p95")
+    ap.add_argument("--samples", type=int, default=200_000, help="Monte Carlo samples per percentile check")
+    ap.add_argument("--out", default=None, help="write result JSON here")
+    args = ap.parse_args()
+    res = optimize(load_inputs(args.excel), args.budget, args.metric, args.samples)
+    if args.out:
+        Path(args.out).write_text(json.dumps(res, indent=2))
+    if not res["feasible"]:
+        print(f"budget {args.budget} ms ({args.metric}) not reachable with Best values ({res['search']})")
+        return
+    print(f"{args.metric}={res['ms']:.1f} ms <= {args.budget} ms  cost={res['cost']}  changes={len(res['changes'])}"
+          f"  ({res['search']})")
+    for ch in res["changes"]:
+        print(f"  [{ch['cost']:<8}] {ch['param']}: {ch['from_value']:g} -> {ch['to_value']:g} ({ch['to']})")
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,97 @@
 #!/usr/bin/env python3
-import sys, json
-from pathlib import Path
-import pandas as pd
-
-COST_COLOR = {"Software":"#E2EFDA", "Config":"#E2EFDA", "Hardware":"#F8CBAD", "Infra":"#F4CCCC"}
-
-def extract(excel_path: Path, scenario: str):
-    df = pd.read_excel(excel_path, sheet_name="Inputs", header=5, usecols="A:H").rename(columns={
-        "Parameter":"param","Description":"desc","Best":"best","Typical":"typical","Worst":"worst","Selected":"sel","Notes":"notes","Cost Type":"cost"
-    })
-    col = {"Best":"best","Typical":"typical","Worst":"worst","Selected":"sel"}[scenario]
+"""
+Site data for site/app.js: one content-addressed bundle with every scenario.
 
-    def get(name):
-        row = df.loc[df["param"] == name]
-        if row.empty: raise KeyError(f"Param '{name}' not found")
-        v = row[col].values[0]
-        if pd.isna(v): raise ValueError(f"Param '{name}' is empty for {scenario}")
-        return float(v)
+  data/bundle.<hash>.json      minified; hash = sha256 of its bytes, so the name changes only with the data
+  data/bundle.<hash>.json.gz   pre-compressed (gzip -9, mtime 0); .br too when `brotli` is installed
+  data/manifest.json           {"bundle", "hash", "model", "scenarios", sizes}: the only file the page revalidates
 
-    def cost(name, default="Software"):
-        row = df.loc[df["param"] == name, "cost"]
-        if row.empty or pd.isna(row.values[0]): return default
-        return str(row.values[0])
+The bundle stores stage names/colors once ("stages") and per scenario only the ms values, plus
+derived views: lane totals, overall, each stage's share of overall (%) and per-stage/lane/overall
+differences vs Typical. Older bundles in the output directory are removed only after the new
+bundle and manifest.json (replaced atomically) are written. --per-scenario also
+writes the previous latency_<scenario>.json files.
+"""
+import argparse, gzip, hashlib, json, os
+from pathlib import Path
+from latency_model import compute
+from latency_cache import cache_key, load, scenario_result
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-    # Leader
-    leader = [
-        {"name":"Leader sensor sampling", "ms": get("Leader sensor sampling (ms)"), "color": COST_COLOR.get(cost("Leader sensor sampling (ms)"))},
-        {"name":"Control loop sched avg", "ms": (1000.0/get("Control loop rate (Hz)"))/2.0, "color": COST_COLOR.get(cost("Control loop rate (Hz)"))},
-        {"name":"OS scheduling jitter", "ms": get("OS scheduling jitter (ms)"), "color": COST_COLOR.get(cost("OS scheduling jitter (ms)"))},
-        {"name":"Leader USB serialization", "ms": (get("Leader USB payload size (bytes)")*8.0)/get("Leader USB serial baud rate (bps)")*1000.0, "color": COST_COLOR.get(cost("Leader USB payload size (bytes)"))},
-        {"name":"Leader USB overhead", "ms": get("Leader USB overhead (ms)"), "color": COST_COLOR.get(cost("Leader USB overhead (ms)"))},
-        {"name":"Command packetization", "ms": get("Command packetization (ms)"), "color": COST_COLOR.get(cost("Command packetization (ms)"))},
-    ]
+BASE = "Typical"
 
-    # Network cmd
-    cmd_net = (get("Straight-line distance (km)")*get("Distance routing factor"))/get("Fiber speed (km/ms)") + get("Command network extra (ms)")
+def extract(excel_path: Path, scenario: str):
+    return scenario_result(excel_path, scenario)
 
-    # Follower
-    follower = [
-        {"name":"Follower USB serialization", "ms": (get("Follower USB payload size (bytes)")*8.0)/get("Follower USB serial baud rate (bps)")*1000.0, "color": COST_COLOR.get(cost("Follower USB payload size (bytes)"))},
-        {"name":"Follower USB overhead", "ms": get("Follower USB overhead (ms)"), "color": COST_COLOR.get(cost("Follower USB overhead (ms)"))},
-        {"name":"Control loop sched avg", "ms": (1000.0/get("Control loop rate (Hz)"))/2.0, "color": COST_COLOR.get(cost("Control loop rate (Hz)"))},
-        {"name":"OS scheduling jitter", "ms": get("OS scheduling jitter (ms)"), "color": COST_COLOR.get(cost("OS scheduling jitter (ms)"))},
-        {"name":"Motor driver processing", "ms": get("Motor driver processing (ms)"), "color": COST_COLOR.get(cost("Motor driver processing (ms)"))},
-        {"name":"Servo command deadband", "ms": get("Servo command deadband (ms)"), "color": COST_COLOR.get(cost("Servo command deadband (ms)"))},
-        {"name":"Mechanical backlash/slop", "ms": get("Mechanical backlash/slop (ms)"), "color": COST_COLOR.get(cost("Mechanical backlash/slop (ms)"))},
-        {"name":"Motor accel to visible motion", "ms": get("Motor accel to visible motion (ms)"), "color": COST_COLOR.get(cost("Motor accel to visible motion (ms)"))},
-    ]
+def measured(excel_path: Path, store_dir, pct=50):
+    """"Measured" scenario: run-store percentiles in place of Typical where measured."""
+    from run_store import RunStore, measured_inputs
+    inputs, _ = load(excel_path)
+    return compute(measured_inputs(inputs, RunStore(store_dir), pct), ["Measured"])["Measured"]
 
-    # Video
-    video_net = (get("Straight-line distance (km)")*get("Distance routing factor"))/get("Fiber speed (km/ms)") + get("Extra network overhead (ms)") + get("TURN/SFU extra hops (ms)")
-    video = [
-        {"name":"Sensor exposure", "ms": get("Exposure/rolling-shutter share (ms)"), "color": COST_COLOR.get(cost("Exposure/rolling-shutter share (ms)"))},
-        {"name":"Frame period avg wait", "ms": (1000.0/get("Camera FPS (Hz)"))/2.0, "color": COST_COLOR.get(cost("Camera FPS (Hz)"))},
-        {"name":"Sensor to memory/ISP", "ms": get("Sensor → memory/ISP (ms)"), "color": COST_COLOR.get(cost("Sensor → memory/ISP (ms)"))},
-        {"name":"Capture buffer", "ms": get("Capture buffer (ms)"), "color": COST_COLOR.get(cost("Capture buffer (ms)"))},
-        {"name":"Encode latency", "ms": get("Encode latency (ms)"), "color": COST_COLOR.get(cost("Encode latency (ms)"))},
-        {"name":"Packetization", "ms": get("Packetization (ms)"), "color": COST_COLOR.get(cost("Packetization (ms)"))},
-        {"name":"FEC/RED overhead", "ms": get("FEC/RED overhead (ms)"), "color": COST_COLOR.get(cost("FEC/RED overhead (ms)"))},
-        {"name":"Network one-way (video)", "ms": video_net, "color": "#F4CCCC"},
-        {"name":"Jitter buffer target", "ms": get("Jitter buffer target (ms)"), "color": COST_COLOR.get(cost("Jitter buffer target (ms)"))},
-        {"name":"Decode latency", "ms": get("Decode latency (ms)"), "color": COST_COLOR.get(cost("Decode latency (ms)"))},
-        {"name":"Renderer/compositor", "ms": get("Renderer/compositor (ms)"), "color": COST_COLOR.get(cost("Renderer/compositor (ms)"))},
-        {"name":"Vsync avg wait", "ms": get("Vsync avg wait (ms)"), "color": COST_COLOR.get(cost("Vsync avg wait (ms)"))},
-    ]
+def bundle(results: dict, model: str = "") -> dict:
+    """{scenario: compute() result} -> compact bundle with derived views."""
+    r4 = lambda v: round(v, 4)
+    first = next(iter(results.values()))
+    stages = {lane: [[s["name"], s["color"]] for s in steps] for lane, steps in first["lanes"].items()}
+    ms = {sc: {lane: [r4(s["ms"]) for s in steps] for lane, steps in r["lanes"].items()} for sc, r in results.items()}
+    doc = {"format": "latency-bundle/1", "model": model, "scenarios": list(results), "stages": stages, "ms": ms,
+           "totals": {sc: {lane: r4(v) for lane, v in r["totals"].items()} for sc, r in results.items()},
+           "overall": {sc: r4(r["overall"]) for sc, r in results.items()},
+           "pct": {sc: {lane: [round(100.0 * v / r["overall"], 2) if r["overall"] else 0.0 for v in vals]
+                        for lane, vals in ms[sc].items()} for sc, r in results.items()}}
+    if BASE in results:
+        base = results[BASE]
+        doc["diff"] = {"base": BASE, **{sc: {
+            "ms": {lane: [r4(a - b) for a, b in zip(vals, ms[BASE][lane])] for lane, vals in ms[sc].items()},
+            "totals": {lane: r4(v - base["totals"][lane]) for lane, v in r["totals"].items()},
+            "overall": r4(r["overall"] - base["overall"])} for sc, r in results.items() if sc != BASE}}
+    return doc
 
-    lanes = {"Leader": leader, "Network":[{"name":"Command network one-way", "ms": cmd_net, "color":"#F4CCCC"}], "Follower": follower, "Video": video}
-    totals = {k: round(sum(s["ms"] for s in v), 3) for k, v in lanes.items()}
-    overall = round(sum(totals.values()), 3)
-    return {"lanes": lanes, "totals": totals, "overall": overall}
+def write_bundle(out_dir: Path, doc: dict) -> dict:
+    raw = json.dumps(doc, separators=(",", ":")).encode()
+    h = hashlib.sha256(raw).hexdigest()[:16]
+    name = f"bundle.{h}.json"
+    manifest = {"format": "latency-manifest/1", "bundle": name, "hash": h, "model": doc["model"],
+                "scenarios": doc["scenarios"], "bytes": len(raw)}
+    (out_dir / name).write_bytes(raw)
+    gz = gzip.compress(raw, 9, mtime=0)
+    (out_dir / f"{name}.gz").write_bytes(gz)
+    manifest["gzip_bytes"] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(raw, quality=11)
+        (out_dir / f"{name}.br").write_bytes(br)
+        manifest["br_bytes"] = len(br)
+    tmp = out_dir / f"manifest.json.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps(manifest, separators=(",", ":")))
+    os.replace(tmp, out_dir / "manifest.json")
+    for old in out_dir.glob("bundle.*.json*"):
+        if not old.name.startswith(name):
+            old.unlink()
+    return manifest
 
 def main():
-    excel = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
-    out_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("site/data")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("excel", nargs="?", default="examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
+    ap.add_argument("out_dir", nargs="?", default="site/data")
+    ap.add_argument("--measured", default=None, help="run store directory: also add the Measured scenario")
+    ap.add_argument("--measured-pct", type=float, default=50, help="percentile of the measured runs")
+    ap.add_argument("--per-scenario", action="store_true", help="also write latency_<scenario>.json (indented)")
+    args = ap.parse_args()
+    excel, out_dir = Path(args.excel), Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
-    for scenario in ["Best","Typical","Worst"]:
-        data = extract(excel, scenario)
-        (out_dir / f"latency_{scenario}.json").write_text(json.dumps(data, indent=2))
-    print("Wrote JSON to", out_dir)
+    _, results = load(excel)
+    results = {s: results[s] if s in results else scenario_result(excel, s) for s in ["Best","Typical","Worst"]}
+    if args.measured:
+        results["Measured"] = measured(excel, args.measured, args.measured_pct)
+    if args.per_scenario:
+        for scenario, data in results.items():
+            (out_dir / f"latency_{scenario}.json").write_text(json.dumps(data, indent=2))
+    m = write_bundle(out_dir, bundle(results, cache_key(excel)))
+    print(f"Wrote {out_dir / m['bundle']} ({m['bytes']} B, gzip {m['gzip_bytes']} B) + manifest.json")
 
 if __name__ == "__main__":
     main()
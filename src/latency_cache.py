@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Content-hash cache for parsed workbooks.
+
+Key = sha256 of the workbook bytes + the latency_model.py source, so edits to either
+invalidate the entry. An entry holds the parsed Inputs table and the computed lane results
+for every complete scenario as gzip'd JSON. On a hit nothing is parsed or computed.
+Entries are evicted least-recently-used once the directory exceeds its size limit.
+
+Environment:
+  LATENCY_CACHE_DIR  cache directory (default ~/.cache/latency, empty string disables)
+  LATENCY_CACHE_MB   size limit in MB (default 64)
+"""
+import gzip, hashlib, json, os
+from pathlib import Path
+import pandas as pd
+import latency_model
+from latency_model import SCENARIOS, SCENARIO_COL, PARAMS, read_inputs, compute
+
+_MODEL_SRC = Path(latency_model.__file__).read_bytes()
+
+def cache_dir():
+    d = os.environ.get("LATENCY_CACHE_DIR", str(Path.home() / ".cache" / "latency"))
+    return Path(d) if d else None
+
+def cache_key(excel_path) -> str:
+    h = hashlib.sha256(_MODEL_SRC)
+    with open(excel_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:32]
+
+def complete_scenarios(inputs):
+    have = [p for p in PARAMS if p in inputs.index]
+    if len(have) < len(PARAMS): return []
+    return [s for s in SCENARIOS if not inputs.loc[PARAMS, SCENARIO_COL[s]].isna().any()]
+
+def _encode(inputs, results):
+    table = inputs.reset_index()
+    return {"inputs": {"columns": list(table.columns), "data": table.astype(object).where(table.notna(), None).values.tolist()},
+            "results": results}
+
+def _decode(entry):
+    t = entry["inputs"]
+    inputs = pd.DataFrame(t["data"], columns=t["columns"]).set_index("param")
+    for col in SCENARIO_COL.values():
+        inputs[col] = pd.to_numeric(inputs[col], errors="coerce").astype(float)
+    return inputs, entry["results"]
+
+def evict(d: Path, max_bytes: int):
+    files = sorted(d.glob("*.json.gz"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    for p in files:
+        if total <= max_bytes: break
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+
+def load(excel_path):
+    """(inputs table, {scenario: result}) for a workbook, from cache when its content is unchanged."""
+    d = cache_dir()
+    if d is None:
+        inputs = read_inputs(excel_path)
+        return inputs, compute(inputs, complete_scenarios(inputs))
+    path = d / f"{cache_key(excel_path)}.json.gz"
+    if path.exists():
+        try:
+            entry = json.loads(gzip.decompress(path.read_bytes()))
+            os.utime(path)  # LRU: refresh mtime on hit
+            return _decode(entry)
+        except (OSError, ValueError, KeyError):
+            path.unlink(missing_ok=True)
+    inputs = read_inputs(excel_path)
+    results = compute(inputs, complete_scenarios(inputs))
+    d.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(gzip.compress(json.dumps(_encode(inputs, results), separators=(",", ":")).encode(), 6))
+    os.replace(tmp, path)
+    evict(d, int(float(os.environ.get("LATENCY_CACHE_MB", "64")) * 1024 * 1024))
+    return inputs, results
+
+def load_inputs(excel_path):
+    return load(excel_path)[0]
+
+def scenario_result(excel_path, scenario):
+    """Result for one scenario; raises like latency_model.compute() when it is incomplete."""
+    inputs, results = load(excel_path)
+    return results[scenario] if scenario in results else compute(inputs, [scenario])[scenario]
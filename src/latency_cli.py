@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+latency — one entry point for the model scripts (src/) and the measurement tools (tools/).
+
+A subcommand runs the existing script unchanged, with the same flags as `python tools/<script>.py`.
+The dispatcher only imports the stdlib, and the script is loaded on first use, so
+`latency serial-ping` never pays for pandas, cv2 or aiortc.
+
+`latency importtime` measures the import time of the lightweight probes in fresh interpreters
+(python -X importtime, best of --runs) and fails when a probe exceeds its budget
+(LIGHT, ms; --scale for slow boards, e.g. 4 on a Jetson Nano) or pulls in a HEAVY module.
+
+  pip install -e .                    # extras: .[model] .[serial] .[video] .[jetson]
+  latency serial-ping --port /dev/ttyACM0
+  latency swimlane examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx --batch diagrams
+  latency importtime --scale 4
+
+Needs a checkout (editable install): the scripts are run from src/ and tools/ next to this file.
+"""
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = {  # name: (dir, script, help)
+    "build-json": ("src", "build_json_from_excel", "site data bundle + manifest (+ Measured)"),
+    "swimlane": ("src", "make_swimlane_from_excel", "swimlane diagram(s), --batch for all scenarios"),
+    "montecarlo": ("src", "montecarlo_from_excel", "Monte Carlo latency distribution"),
+    "sensitivity": ("src", "sensitivity_from_excel", "tornado sensitivity data"),
+    "budget": ("src", "budget_from_excel", "cheapest upgrades to hit a latency target"),
+    "runs": ("src", "run_store", "ingest/query measured runs"),
+    "hist": ("tools", "latency_hist", "show/merge histogram snapshots"),
+    "serial-ping": ("tools", "serial_ping", "USB-serial roundtrip"),
+    "serial-echo-sim": ("tools", "serial_echo_sim", "PTY echo device emulator"),
+    "serial-bench": ("tools", "serial_bench", "serial_ping regression bench"),
+    "gpio-pulse": ("tools", "gpio_pulse", "GPIO edge latency (tx/rx/capture/analyze)"),
+    "loop-jitter": ("tools", "loop_jitter", "control loop scheduling jitter"),
+    "udp-probe": ("tools", "udp_probe", "UDP one-way/RTT probe"),
+    "frame-timer": ("tools", "opencv_frame_timer", "camera frame intervals, driver timestamps"),
+    "video-led": ("tools", "video_led_tester", "LED-to-screen video latency"),
+    "webrtc-echo": ("tools", "webrtc_echo", "local aiortc loopback latency"),
+    "webrtc-server": ("tools", "jetson_webrtc_server", "Jetson WebRTC camera server"),
+}
+
+# lightweight probes: import budget in ms (cumulative, fresh interpreter)
+LIGHT = {"latency_cli": 10, "latency_hist": 25, "serial_ping": 60, "serial_echo_sim": 40, "gpio_pulse": 50,
+         "loop_jitter": 50, "udp_probe": 150, "run_store": 60}
+HEAVY = ("numpy", "pandas", "cv2", "av", "aiortc", "aiohttp", "graphviz", "openpyxl")
+
+def usage(out=sys.stdout):
+    print("usage: latency <command> [args...]   (latency <command> -h for its flags)\n", file=out)
+    for name, (_, _, text) in COMMANDS.items():
+        print(f"  {name:<16} {text}", file=out)
+    print(f"  {'importtime':<16} check the import-time budget of the lightweight probes", file=out)
+
+def run(name, argv):
+    d, script, _ = COMMANDS[name]
+    for p in (os.path.join(ROOT, "src"), os.path.join(ROOT, "tools"), os.path.join(ROOT, d)):
+        if p in sys.path: sys.path.remove(p)
+        sys.path.insert(0, p)   # the script's own dir first, like `python <dir>/<script>.py`
+    path = os.path.join(ROOT, d, script + ".py")
+    if not os.path.exists(path):
+        raise SystemExit(f"latency: {path} not found (install from a checkout: pip install -e .)")
+    import runpy
+    sys.argv = [path] + argv
+    runpy.run_path(path, run_name="__main__")
+
+def import_profile(module, env):
+    """(cumulative ms, heavy top-level packages) for importing `module` in a fresh interpreter."""
+    import subprocess
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=env,
+                       capture_output=True, text=True)
+    lines = [l.split("|") for l in r.stderr.splitlines() if l.startswith("import time:") and l.count("|") == 2]
+    if r.returncode:
+        raise RuntimeError(r.stderr.strip().splitlines()[-1] if r.stderr.strip() else f"exit {r.returncode}")
+    total = next((int(c) for _, c, n in lines if n.strip() == module and not n[1:].startswith(" ")), 0)
+    heavy = {n.strip().split(".")[0] for _, _, n in lines} & set(HEAVY)
+    return total / 1000.0, heavy
+
+def importtime(argv):
+    import argparse
+    ap = argparse.ArgumentParser(prog="latency importtime")
+    ap.add_argument("modules", nargs="*", default=list(LIGHT), help="default: all lightweight probes")
+    ap.add_argument("--scale", type=float, default=1.0, help="budget multiplier for slower machines")
+    ap.add_argument("--runs", type=int, default=3, help="fresh interpreters per module; best is compared")
+    a = ap.parse_args(argv)
+    path = [os.path.join(ROOT, "src"), os.path.join(ROOT, "tools"), os.environ.get("PYTHONPATH", "")]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in path if p))
+    failed = 0
+    for mod in a.modules:
+        budget = LIGHT.get(mod, 0) * a.scale
+        try:
+            prof = [import_profile(mod, env) for _ in range(a.runs)]
+        except RuntimeError as e:
+            print(f"{mod:<18} FAIL import error: {e}")
+            failed += 1
+            continue
+        ms, heavy = min(p[0] for p in prof), set().union(*(p[1] for p in prof))
+        bad = mod in LIGHT and bool(heavy or ms > budget)   # other modules: reported only
+        note = f" pulls in {', '.join(sorted(heavy))}" if heavy else ""
+        limit = f"budget {budget:g} ms" if mod in LIGHT else "no budget"
+        print(f"{mod:<18} {'FAIL' if bad else 'ok  '} {ms:7.1f} ms  ({limit}){note}")
+        failed += bool(bad)
+    print(f"{failed} over budget" if failed else "all within budget")
+    return 1 if failed else 0
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        usage()
+        return 0
+    name, rest = argv[0], argv[1:]
+    if name == "importtime":
+        return importtime(rest)
+    if name not in COMMANDS:
+        print(f"latency: unknown command '{name}'\n", file=sys.stderr)
+        usage(sys.stderr)
+        return 2
+    run(name, rest)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
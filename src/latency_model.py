@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Shared teleop latency model.
+
+Parses the Excel Inputs sheet once into an indexed parameter table and evaluates every
+lane formula for all scenario columns (Best/Typical/Worst/Selected) in one vectorized pass.
+Used by build_json_from_excel.py and make_swimlane_from_excel.py.
+
+The stage formulas only use elementwise arithmetic, so `stage_values()` works for any
+array shape: one value per scenario, Monte Carlo samples, or batched parameter sweeps.
+"""
+from collections import namedtuple
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+SCENARIOS = ["Best", "Typical", "Worst", "Selected"]
+SCENARIO_COL = {"Best":"best", "Typical":"typical", "Worst":"worst", "Selected":"sel"}
+COLUMNS = {
+    "Parameter":"param","Description":"desc","Best":"best","Typical":"typical","Worst":"worst","Selected":"sel","Notes":"notes","Cost Type":"cost"
+}
+COST_COLOR = {"Software":"#E2EFDA", "Config":"#E2EFDA", "Hardware":"#F8CBAD", "Infra":"#F4CCCC"}
+NETWORK_COLOR = "#F4CCCC"
+
+# cost: parameter whose "Cost Type" colors the stage (None -> NETWORK_COLOR)
+Stage = namedtuple("Stage", "name cost fn")
+
+def _param(name, param):
+    return Stage(name, param, lambda p: p(param))
+
+def _usb_ser(side):
+    return lambda p: (p(f"{side} USB payload size (bytes)")*8.0)/p(f"{side} USB serial baud rate (bps)")*1000.0
+
+def _fiber(p):
+    return (p("Straight-line distance (km)")*p("Distance routing factor"))/p("Fiber speed (km/ms)")
+
+def _loop_half(p):
+    return (1000.0/p("Control loop rate (Hz)"))/2.0
+
+LANES = {
+    "Leader": [
+        _param("Leader sensor sampling", "Leader sensor sampling (ms)"),
+        Stage("Control loop sched avg", "Control loop rate (Hz)", _loop_half),
+        _param("OS scheduling jitter", "OS scheduling jitter (ms)"),
+        Stage("Leader USB serialization", "Leader USB payload size (bytes)", _usb_ser("Leader")),
+        _param("Leader USB overhead", "Leader USB overhead (ms)"),
+        _param("Command packetization", "Command packetization (ms)"),
+    ],
+    "Network": [
+        Stage("Command network one-way", None, lambda p: _fiber(p) + p("Command network extra (ms)")),
+    ],
+    "Follower": [
+        Stage("Follower USB serialization", "Follower USB payload size (bytes)", _usb_ser("Follower")),
+        _param("Follower USB overhead", "Follower USB overhead (ms)"),
+        Stage("Control loop sched avg", "Control loop rate (Hz)", _loop_half),
+        _param("OS scheduling jitter", "OS scheduling jitter (ms)"),
+        _param("Motor driver processing", "Motor driver processing (ms)"),
+        _param("Servo command deadband", "Servo command deadband (ms)"),
+        _param("Mechanical backlash/slop", "Mechanical backlash/slop (ms)"),
+        _param("Motor accel to visible motion", "Motor accel to visible motion (ms)"),
+    ],
+    "Video": [
+        _param("Sensor exposure", "Exposure/rolling-shutter share (ms)"),
+        Stage("Frame period avg wait", "Camera FPS (Hz)", lambda p: (1000.0/p("Camera FPS (Hz)"))/2.0),
+        _param("Sensor to memory/ISP", "Sensor → memory/ISP (ms)"),
+        _param("Capture buffer", "Capture buffer (ms)"),
+        _param("Encode latency", "Encode latency (ms)"),
+        _param("Packetization", "Packetization (ms)"),
+        _param("FEC/RED overhead", "FEC/RED overhead (ms)"),
+        Stage("Network one-way (video)", None,
+              lambda p: _fiber(p) + p("Extra network overhead (ms)") + p("TURN/SFU extra hops (ms)")),
+        _param("Jitter buffer target", "Jitter buffer target (ms)"),
+        _param("Decode latency", "Decode latency (ms)"),
+        _param("Renderer/compositor", "Renderer/compositor (ms)"),
+        _param("Vsync avg wait", "Vsync avg wait (ms)"),
+    ],
+}
+
+STAGES = [(lane, s) for lane, stages in LANES.items() for s in stages]
+LANE_SLICES = {}
+_i = 0
+for _lane, _stages in LANES.items():
+    LANE_SLICES[_lane] = slice(_i, _i + len(_stages))
+    _i += len(_stages)
+
+def _stage_params(stage):
+    seen = []
+    def rec(name):
+        if name not in seen: seen.append(name)
+        return 1.0
+    stage.fn(rec)
+    return seen
+
+# Parameters each stage reads, and all of them in first-use order
+STAGE_PARAMS = [_stage_params(s) for _, s in STAGES]
+PARAMS = list(dict.fromkeys(name for names in STAGE_PARAMS for name in names))
+
+def read_inputs(excel_path) -> pd.DataFrame:
+    """Parse the Inputs sheet once; returns a table indexed by parameter name.
+
+    Streams only columns A:H of the Inputs sheet (openpyxl read-only mode, header on row 6)
+    instead of loading the whole workbook.
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(Path(excel_path), read_only=True, data_only=True)
+    try:
+        rows = wb["Inputs"].iter_rows(min_row=6, max_col=8, values_only=True)
+        header = [str(h) if h is not None else f"col{i}" for i, h in enumerate(next(rows))]
+        df = pd.DataFrame([r for r in rows if any(v is not None for v in r)], columns=header)
+    finally:
+        wb.close()
+    return inputs_frame(df.rename(columns=COLUMNS))
+
+def inputs_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize a raw Inputs table (numeric scenario columns, unique param index)."""
+    df = df.dropna(subset=["param"]).drop_duplicates("param").set_index("param")
+    for col in SCENARIO_COL.values():
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype(float)
+    return df
+
+def stage_values(get) -> np.ndarray:
+    """Evaluate every stage with `get(param) -> array`; returns shape (n_stages, *array_shape)."""
+    return np.stack(np.broadcast_arrays(*[np.asarray(s.fn(get), dtype=float) for _, s in STAGES]))
+
+def lane_totals(values: np.ndarray) -> dict:
+    return {lane: values[sl].sum(axis=0) for lane, sl in LANE_SLICES.items()}
+
+def scenario_column(scenario) -> str:
+    """Inputs column for a scenario; extra scenarios (e.g. "Measured") use their lower-case name."""
+    return SCENARIO_COL.get(scenario, scenario.lower())
+
+def scenario_getter(inputs: pd.DataFrame, scenarios):
+    """Accessor returning one value per requested scenario for a parameter."""
+    cols = [scenario_column(s) for s in scenarios]
+    table = inputs[cols].to_numpy(dtype=float)
+    index = {name: i for i, name in enumerate(inputs.index)}
+    def get(name):
+        i = index.get(name)
+        if i is None: raise KeyError(f"Param '{name}' not found")
+        return table[i]
+    return get
+
+def check_inputs(inputs: pd.DataFrame, scenarios):
+    for name in PARAMS:
+        if name not in inputs.index: raise KeyError(f"Param '{name}' not found")
+    for scenario in scenarios:
+        vals = inputs.loc[PARAMS, scenario_column(scenario)]
+        empty = vals[vals.isna()]
+        if not empty.empty: raise ValueError(f"Param '{empty.index[0]}' is empty for {scenario}")
+
+def param_cost(inputs: pd.DataFrame, name, default="Software"):
+    """"Cost Type" of a parameter (Software/Config/Hardware/Infra)."""
+    v = inputs["cost"].get(name) if "cost" in inputs else None
+    return default if v is None or pd.isna(v) else str(v)
+
+def stage_colors(inputs: pd.DataFrame):
+    return [NETWORK_COLOR if s.cost is None else COST_COLOR.get(param_cost(inputs, s.cost)) for _, s in STAGES]
+
+def compute(inputs: pd.DataFrame, scenarios=("Best", "Typical", "Worst")) -> dict:
+    """Evaluate all lanes for the given scenarios in one pass.
+
+    Returns {scenario: {"lanes": {lane: [{name, ms, color}]}, "totals": {...}, "overall": float}}.
+    """
+    scenarios = list(scenarios)
+    check_inputs(inputs, scenarios)
+    values = stage_values(scenario_getter(inputs, scenarios))
+    totals = lane_totals(values)
+    colors = stage_colors(inputs)
+    out = {}
+    for j, scenario in enumerate(scenarios):
+        lanes = {lane: [] for lane in LANES}
+        for k, (lane, s) in enumerate(STAGES):
+            lanes[lane].append({"name": s.name, "ms": float(values[k, j]), "color": colors[k]})
+        lane_tot = {lane: round(float(t[j]), 3) for lane, t in totals.items()}
+        out[scenario] = {"lanes": lanes, "totals": lane_tot, "overall": round(sum(lane_tot.values()), 3)}
+    return out
@@ -4,82 +4,28 @@ Generate a teleop latency swimlane diagram from the Excel Inputs sheet.
 
 Usage:
   python src/make_swimlane_from_excel.py examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx out.png
+  python src/make_swimlane_from_excel.py examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx --batch diagrams
 If arguments are omitted, defaults are used.
+
+--batch renders every complete scenario from one (cached) parse, PNG and SVG, on a process pool.
+Outputs whose graph source (+ format) hash matches the one in DIR/.swimlane_hashes.json and that
+still exist are skipped, so Graphviz only runs for diagrams whose numbers changed.
 """
-import sys
+import argparse, hashlib, json, os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import pandas as pd
+import graphviz
 from graphviz import Digraph
+from latency_cache import load, scenario_result
 
-def build_diagram(excel_path, out_png, use_column="Typical"):
-    excel_path = Path(excel_path)
-    df = pd.read_excel(excel_path, sheet_name="Inputs", header=5, usecols="A:H").rename(columns={
-        "Parameter":"param","Description":"desc","Best":"best","Typical":"typical","Worst":"worst","Selected":"sel","Notes":"notes","Cost Type":"cost"
-    })
-    col = {"Best":"best","Typical":"typical","Worst":"worst","Selected":"sel"}[use_column]
-
-    def get_val(name: str):
-        row = df.loc[df["param"] == name]
-        if row.empty:
-            raise KeyError(f"Parameter not found: {name}")
-        v = row[col].values[0]
-        if pd.isna(v):
-            raise ValueError(f"Value for '{name}' in column '{use_column}' is empty.")
-        return float(v)
-
-    # Leader
-    leader_stages = [
-        ("Leader sensor sampling", get_val("Leader sensor sampling (ms)")),
-        ("Control loop sched avg", (1000.0/get_val("Control loop rate (Hz)"))/2.0),
-        ("OS scheduling jitter", get_val("OS scheduling jitter (ms)")),
-        ("Leader USB serialization", (get_val("Leader USB payload size (bytes)")*8.0)/get_val("Leader USB serial baud rate (bps)")*1000.0),
-        ("Leader USB overhead", get_val("Leader USB overhead (ms)")),
-        ("Command packetization", get_val("Command packetization (ms)")),
-    ]
-
-    # Command network one-way
-    cmd_net_one_way = (
-        (get_val("Straight-line distance (km)") * get_val("Distance routing factor")) / get_val("Fiber speed (km/ms)")
-        + (get_val("Command network extra (ms)"))
-    )
+HASHES = ".swimlane_hashes.json"
 
-    # Follower
-    follower_stages = [
-        ("Follower USB serialization", (get_val("Follower USB payload size (bytes)")*8.0)/get_val("Follower USB serial baud rate (bps)")*1000.0),
-        ("Follower USB overhead", get_val("Follower USB overhead (ms)")),
-        ("Control loop sched avg", (1000.0/get_val("Control loop rate (Hz)"))/2.0),
-        ("OS scheduling jitter", get_val("OS scheduling jitter (ms)")),
-        ("Motor driver processing", get_val("Motor driver processing (ms)")),
-        ("Servo command deadband", get_val("Servo command deadband (ms)")),
-        ("Mechanical backlash/slop", get_val("Mechanical backlash/slop (ms)")),
-        ("Motor accel to visible motion", get_val("Motor accel to visible motion (ms)")),
-    ]
-
-    # Video
-    video_net_one_way = (
-        (get_val("Straight-line distance (km)") * get_val("Distance routing factor")) / get_val("Fiber speed (km/ms)")
-        + get_val("Extra network overhead (ms)") + get_val("TURN/SFU extra hops (ms)")
-    )
-    video_stages = [
-        ("Sensor exposure", get_val("Exposure/rolling-shutter share (ms)")),
-        ("Frame period avg wait", (1000.0/get_val("Camera FPS (Hz)"))/2.0),
-        ("Sensor to memory/ISP", get_val("Sensor → memory/ISP (ms)")),
-        ("Capture buffer", get_val("Capture buffer (ms)")),
-        ("Encode latency", get_val("Encode latency (ms)")),
-        ("Packetization", get_val("Packetization (ms)")),
-        ("FEC/RED overhead", get_val("FEC/RED overhead (ms)")),
-        ("Network one-way (video)", video_net_one_way),
-        ("Jitter buffer target", get_val("Jitter buffer target (ms)")),
-        ("Decode latency", get_val("Decode latency (ms)")),
-        ("Renderer/compositor", get_val("Renderer/compositor (ms)")),
-        ("Vsync avg wait", get_val("Vsync avg wait (ms)")),
-    ]
-
-    lanes = {"Leader": leader_stages, "Network":[("Command network one-way", cmd_net_one_way)], "Follower": follower_stages, "Video": video_stages}
+def build_graph(result, fmt="png"):
+    lanes = {lane: [(s["name"], s["ms"]) for s in steps] for lane, steps in result["lanes"].items()}
     totals = {k: sum(v for _, v in steps) for k, steps in lanes.items()}
     overall = sum(totals.values())
 
-    g = Digraph("SwimlaneFromExcel", format="png")
+    g = Digraph("SwimlaneFromExcel", format=fmt)
     g.attr(rankdir="LR")
 
     for lane, steps in lanes.items():
@@ -93,23 +39,78 @@ def build_diagram(excel_path, out_png, use_column="Typical"):
                     c.edge(prev, nid)
                 prev = nid
 
-    g.edge("Leader_5", "Network_0")
-    g.edge("Network_0", "Follower_0")
-    g.edge("Follower_7", "Video_0")
-    g.edge("Leader_0", "Follower_0", style="dashed", label="Direct timing")
-    g.edge("Video_0", "Video_11", style="dashed", label="Video-only")
+    # lanes run in order (Leader -> Network -> Follower -> Video): last step of one feeds the first of the next
+    chain = [lane for lane, steps in lanes.items() if steps]
+    first = {lane: f"{lane}_0" for lane in chain}
+    last = {lane: f"{lane}_{len(lanes[lane]) - 1}" for lane in chain}
+    for a, b in zip(chain, chain[1:]):
+        g.edge(last[a], first[b])
+    if "Leader" in first and "Follower" in first:
+        g.edge(first["Leader"], first["Follower"], style="dashed", label="Direct timing")
+    if "Video" in first:
+        g.edge(first["Video"], last["Video"], style="dashed", label="Video-only")
 
     g.node("TotalNode", f"Overall Command→Photon\\n{overall:.1f} ms", shape="note", style="filled", fillcolor="lightyellow")
-    g.edge("Video_11", "TotalNode", style="bold")
+    if chain:
+        g.edge(last[chain[-1]], "TotalNode", style="bold")
+    return g
 
+def build_diagram(excel_path, out_png, use_column="Typical"):
+    g = build_graph(scenario_result(excel_path, use_column))
     out = Path(out_png)
     g.render(str(out.with_suffix("")), cleanup=True)
     return str(out)
 
+def _render(source, fmt, path):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    Path(tmp).write_bytes(graphviz.pipe("dot", fmt, source.encode()))
+    os.replace(tmp, path)
+    return path
+
+def render_all(excel_path, out_dir, scenarios=None, formats=("png", "svg"), jobs=None, force=False, prefix="teleop_latency"):
+    """Render all (or the given) scenarios x formats; returns (written, skipped) path lists."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    _, results = load(excel_path)
+    hash_file = out_dir / HASHES
+    old = json.loads(hash_file.read_text()) if hash_file.exists() else {}
+    new, todo, skipped = {}, [], []
+    for scenario in scenarios or list(results):
+        result = results[scenario] if scenario in results else scenario_result(excel_path, scenario)
+        source = build_graph(result).source
+        for fmt in formats:
+            name = f"{prefix}_{scenario}.{fmt}"
+            new[name] = hashlib.sha256(f"{fmt}\0{source}".encode()).hexdigest()[:32]
+            if not force and old.get(name) == new[name] and (out_dir / name).exists():
+                skipped.append(str(out_dir / name))
+            else:
+                todo.append((source, fmt, str(out_dir / name)))
+    if len(todo) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            written = list(pool.map(_render, *zip(*todo)))
+    else:
+        written = [_render(*t) for t in todo]
+    hash_file.write_text(json.dumps({**old, **new}, indent=2, sort_keys=True))
+    return written, skipped
+
 if __name__ == "__main__":
-    excel = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
-    out_png = sys.argv[2] if len(sys.argv) > 2 else "teleop_latency_swimlane_from_excel.png"
-    col = sys.argv[3] if len(sys.argv) > 3 else "Typical"  # Best|Typical|Worst|Selected (Selected needs Excel calc)
-    print("Using:", excel, "->", out_png, "| column:", col)
-    p = build_diagram(excel, out_png, use_column=col)
-    print("Wrote:", p)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("excel", nargs="?", default="examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
+    ap.add_argument("out_png", nargs="?", default="teleop_latency_swimlane_from_excel.png")
+    ap.add_argument("column", nargs="?", default="Typical", help="Best|Typical|Worst|Selected (Selected needs Excel calc)")
+    ap.add_argument("--batch", metavar="DIR", default=None, help="render all scenarios into DIR")
+    ap.add_argument("--scenarios", default=None, help="--batch: comma-separated subset")
+    ap.add_argument("--formats", default="png,svg", help="--batch: output formats")
+    ap.add_argument("--jobs", type=int, default=None, help="--batch: render processes (default: CPU count)")
+    ap.add_argument("--force", action="store_true", help="--batch: render even when unchanged")
+    args = ap.parse_args()
+    excel = Path(args.excel)
+    if args.batch:
+        written, skipped = render_all(excel, args.batch, args.scenarios.split(",") if args.scenarios else None,
+                                      args.formats.split(","), args.jobs, args.force)
+        for p in written: print("Wrote:", p)
+        print(f"{len(written)} rendered, {len(skipped)} unchanged in {args.batch}")
+    else:
+        print("Using:", excel, "->", args.out_png, "| column:", args.column)
+        p = build_diagram(excel, args.out_png, use_column=args.column)
+        print("Wrote:", p)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo end-to-end latency distribution from the Excel Inputs sheet.
+
+Each parameter's Best/Typical/Worst is treated as a triangular or PERT distribution.
+Samples are drawn in fixed-size chunks (bounded memory) and reduced into fixed-resolution
+histograms per lane and for Command→Photon, from which percentiles are read.
+
+Stages whose parameters are used by no other stage are independent, so per lane their sum
+is folded up front into one composite distribution (convolution of their discretized PMFs).
+Per sample only the shared parameters (control loop rate, OS jitter, routing, ...) and one
+composite per lane are drawn, which keeps 10^7 samples at about a second.
+
+Usage:
+  python src/montecarlo_from_excel.py examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx site/data/latency_mc.json --samples 10000000 --dist pert
+"""
+import argparse, json, sys, time
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from latency_cache import load_inputs
+from latency_model import LANES, STAGES, STAGE_PARAMS, PARAMS, check_inputs
+
+TABLE = 1 << 14        # inverse-CDF table size per drawn variable
+GRID = 1 << 14         # histogram bins per lane (percentile resolution)
+GRID_POINTS = 1 << 20  # max formula evaluations when tabulating one private stage
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+def quantile_table(lo, mode, hi, dist="pert", k=TABLE):
+    """Values of the distribution at the k midpoint quantiles (k equally likely points)."""
+    q = (np.arange(k) + 0.5) / k
+    if hi <= lo:
+        return np.full(k, lo, dtype=float)
+    if dist == "triangular":
+        fc = (mode - lo) / (hi - lo)
+        return np.where(q < fc, lo + np.sqrt(q*(hi-lo)*(mode-lo)), hi - np.sqrt((1-q)*(hi-lo)*(hi-mode)))
+    if dist == "pert":
+        a = 1 + 4*(mode - lo)/(hi - lo)
+        b = 1 + 4*(hi - mode)/(hi - lo)
+        t = np.linspace(0.0, 1.0, 1 << 16)
+        pdf = t**(a-1) * (1-t)**(b-1)
+        cdf = np.concatenate([[0.0], np.cumsum((pdf[1:] + pdf[:-1]) / 2)])
+        return lo + (hi - lo)*np.interp(q, cdf / cdf[-1], t)
+    raise ValueError(f"Unknown distribution: {dist}")
+
+def param_range(inputs, name):
+    """(lo, mode, hi) from the Best/Typical/Worst columns; Best may be the high end (rates, baud)."""
+    vals = inputs.loc[name, ["best", "typical", "worst"]].to_numpy(dtype=float)
+    lo, hi = vals.min(), vals.max()
+    return lo, min(max(vals[1], lo), hi), hi
+
+def _grid_eval(fn, tables):
+    """Evaluate a stage on the outer product of its parameter tables (dict name -> 1-D array)."""
+    axes = {name: i for i, name in enumerate(tables)}
+    def get(name):
+        v = tables[name]
+        return v.reshape([-1 if j == axes[name] else 1 for j in range(len(axes))]) if v.ndim else v
+    return np.asarray(fn(get), dtype=float)
+
+def _composite(values, weights):
+    """Sum of independent discrete variables -> (values, pmf) on one grid via FFT convolution."""
+    lo = sum(v.min() for v in values)
+    hi = sum(v.max() for v in values)
+    if hi - lo <= 1e-12:
+        return np.array([lo]), np.array([1.0])
+    dx = (hi - lo) / (GRID - 1)
+    pmfs = []
+    for v, w in zip(values, weights):
+        idx = np.rint((v - v.min()) / dx).astype(np.int64)
+        pmfs.append(np.bincount(idx, weights=np.broadcast_to(w, v.shape), minlength=1))
+    n = sum(len(p) for p in pmfs) - len(pmfs) + 1
+    size = 1 << int(np.ceil(np.log2(n)))
+    spec = np.ones(size // 2 + 1, dtype=complex)
+    for p in pmfs:
+        spec *= np.fft.rfft(p, size)
+    pmf = np.clip(np.fft.irfft(spec, size)[:n], 0, None)
+    return lo + dx*np.arange(n), pmf / pmf.sum()
+
+def plan(inputs, dist="pert"):
+    """Split the model into per-lane composites (precomputed) and per-sample draws."""
+    ranges = {name: param_range(inputs, name) for name in PARAMS}
+    const = {name: r[0] for name, r in ranges.items() if r[2] <= r[0]}
+    uses = Counter(name for names in STAGE_PARAMS for name in names if name not in const)
+    private = [all(uses[n] == 1 for n in names if n not in const) for names in STAGE_PARAMS]
+
+    comp_vals = {lane: [] for lane in LANES}
+    comp_w = {lane: [] for lane in LANES}
+    shared = []
+    for k, (lane, s) in enumerate(STAGES):
+        if not private[k]:
+            shared.append(k)
+            continue
+        var = [n for n in STAGE_PARAMS[k] if n not in const]
+        m = max(2, min(TABLE, int(GRID_POINTS ** (1.0 / len(var))))) if var else 1
+        tables = {n: quantile_table(*ranges[n], dist, m) for n in var}
+        tables.update({n: np.float64(const[n]) for n in STAGE_PARAMS[k] if n in const})
+        v = _grid_eval(s.fn, tables).ravel()
+        comp_vals[lane].append(v)
+        comp_w[lane].append(1.0 / v.size)
+
+    draws = {}
+    for k in shared:
+        for n in STAGE_PARAMS[k]:
+            if n not in const and n not in draws:
+                draws[n] = quantile_table(*ranges[n], dist).astype(np.float32)
+    composites = {}
+    for lane in LANES:
+        if comp_vals[lane]:
+            vals, pmf = _composite(comp_vals[lane], comp_w[lane])
+            cdf = np.cumsum(pmf)
+            q = (np.arange(TABLE) + 0.5) / TABLE
+            composites[lane] = vals[np.minimum(np.searchsorted(cdf, q), len(vals) - 1)].astype(np.float32)
+
+    # Histogram ranges: composite support plus stage extremes (formulas are monotonic per parameter)
+    bounds = {lane: [float(t.min()), float(t.max())] for lane, t in composites.items()}
+    for k in shared:
+        lane, s = STAGES[k]
+        ext = {n: (np.array([draws[n].min(), draws[n].max()], dtype=float) if n in draws else np.float64(const[n]))
+               for n in STAGE_PARAMS[k]}
+        v = _grid_eval(s.fn, ext)
+        lo, hi = bounds.setdefault(lane, [0.0, 0.0])
+        bounds[lane] = [lo + float(v.min()), hi + float(v.max())]
+    bounds["overall"] = [sum(b[0] for b in bounds.values()), sum(b[1] for b in bounds.values())]
+    return {"const": const, "draws": draws, "composites": composites, "shared": shared, "bounds": bounds}
+
+class _Hist:
+    def __init__(self, lo, hi):
+        self.lo, self.hi = lo, hi
+        self.scale = GRID / (hi - lo) if hi > lo else 0.0
+        self.counts = np.zeros(GRID, dtype=np.int64)
+
+    def add(self, x):
+        i = ((x - self.lo) * self.scale).astype(np.int32)
+        np.clip(i, 0, GRID - 1, out=i)
+        self.counts += np.bincount(i, minlength=GRID)
+
+    def summary(self, percentiles=PERCENTILES, bins=64):
+        width = (self.hi - self.lo) / GRID
+        cum = np.cumsum(self.counts)
+        n = int(cum[-1])
+        mid = self.lo + (np.arange(GRID) + 0.5)*width
+        mean = float(np.dot(self.counts, mid)) / n
+        out = {"mean": round(mean, 3), "std": round(float(np.sqrt(np.dot(self.counts, (mid - mean)**2) / n)), 3)}
+        for p in percentiles:
+            target = p / 100.0 * n
+            i = min(int(np.searchsorted(cum, target)), GRID - 1)
+            prev = cum[i-1] if i else 0
+            frac = (target - prev) / self.counts[i] if self.counts[i] else 0.0
+            out[f"p{p:g}"] = round(float(self.lo + (i + frac)*width), 3)
+        edges = np.linspace(0, GRID, bins + 1).astype(int)
+        out["hist"] = {"lo": round(self.lo, 3), "hi": round(self.hi, 3),
+                       "counts": np.add.reduceat(self.counts, edges[:-1]).tolist()}
+        return out
+
+def simulate(inputs, samples=1_000_000, dist="pert", chunk=1 << 18, seed=None, percentiles=PERCENTILES, bins=64):
+    """Sample the model `samples` times; returns percentiles + histogram per lane and overall."""
+    check_inputs(inputs, ["Best", "Typical", "Worst"])
+    p = plan(inputs, dist)
+    rng = np.random.default_rng(seed)
+    draws, composites, const = p["draws"], p["composites"], p["const"]
+    names = list(draws) + [f"lane:{lane}" for lane in composites]
+    tables = list(draws.values()) + list(composites.values())
+    hists = {k: _Hist(*b) for k, b in p["bounds"].items()}
+
+    for start in range(0, samples, chunk):
+        n = min(chunk, samples - start)
+        # raw 64-bit words split into 16-bit table indices: much cheaper than rng.integers
+        idx = rng.bit_generator.random_raw(-(-len(tables)*n // 4)).view(np.uint16)[:len(tables)*n].reshape(len(tables), n)
+        idx &= np.uint16(TABLE - 1)
+        drawn = {name: tab.take(idx[i]) for i, (name, tab) in enumerate(zip(names, tables))}
+        get = lambda name: drawn[name] if name in drawn else const[name]
+        totals = {lane: drawn[f"lane:{lane}"] for lane in composites}
+        for k in p["shared"]:
+            lane, s = STAGES[k]
+            v = s.fn(get)
+            totals[lane] = totals[lane] + v if lane in totals else np.broadcast_to(np.float32(v), (n,)).copy()
+        overall = np.zeros(n, dtype=np.float32)
+        for lane in LANES:
+            hists[lane].add(totals[lane])
+            overall += totals[lane]
+        hists["overall"].add(overall)
+
+    return {"dist": dist, "samples": samples,
+            "lanes": {lane: hists[lane].summary(percentiles, bins) for lane in LANES},
+            "overall": hists["overall"].summary(percentiles, bins)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("excel", nargs="?", default="examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
+    ap.add_argument("out", nargs="?", default="site/data/latency_mc.json")
+    ap.add_argument("--samples", type=float, default=1e6)
+    ap.add_argument("--dist", choices=["pert", "triangular"], default="pert")
+    ap.add_argument("--chunk", type=int, default=1 << 18)
+    ap.add_argument("--bins", type=int, default=64, help="histogram bins in the output")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    res = simulate(load_inputs(args.excel), int(args.samples), args.dist, args.chunk, args.seed, bins=args.bins)
+    dt = time.perf_counter() - t0
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(res, indent=2))
+    o = res["overall"]
+    print(f"samples={res['samples']} dist={args.dist} p50={o['p50']:.1f} p95={o['p95']:.1f} p99={o['p99']:.1f} ms ({dt:.2f}s)")
+    print("Wrote", out, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
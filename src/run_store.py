@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Append-only store for measurement runs, feeding measured values back into the model.
+
+Ingests PLAN.md run JSON files and tool outputs, maps them to Inputs parameters and appends one
+NDJSON line per run to the current segment (segments/000001.ndjson, rotated every SEGMENT_RUNS
+runs). Per-parameter percentiles are kept incrementally in state.json as log-bucketed histograms
+(tools/latency_hist.py), so ingest and query never rescan history; `rebuild` replays the
+segments when the mapping changes.
+
+Recognized inputs:
+  PLAN.md run JSON             leader/network/follower/video sections (RUN_FIELDS)
+  JSON with "inputs"           loop_jitter.py, udp_probe.py, opencv_frame_timer --driver: {parameter: value}
+  latency-hist snapshots       serial_ping (USB overhead, --side), gpio_pulse capture (driver), opencv_frame_timer (FPS)
+  /metrics.json                jetson_webrtc_server: encode, jitter buffer, decode
+
+Network RTT and video one-way delay are stored as measured quantities and converted to the
+"extra" parameters at build time, using the fiber time from the workbook. Rates are stored as
+half-periods in ms (the latency they add) and converted to Hz at build time, so a high
+percentile stays the slow end. A parameter measured directly wins over a derived value.
+
+Usage:
+  python src/run_store.py ingest runs/incoming/*.json --store runs
+  python src/run_store.py query --store runs
+  python src/build_json_from_excel.py examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx site/data --measured runs
+"""
+import argparse, hashlib, json, math, os, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+from latency_hist import Histogram  # noqa: E402
+
+SEGMENT_RUNS = 1000
+PERCENTILES = (50, 90, 95, 99)
+
+def _fiber(p):
+    return p("Straight-line distance (km)") * p("Distance routing factor") / p("Fiber speed (km/ms)")
+
+# PLAN.md run JSON: (section, key) -> (stored quantity, transform)
+RUN_FIELDS = {
+    ("leader", "sensor_ms"): ("Leader sensor sampling (ms)", None),
+    ("leader", "loop_avg_ms"): ("Control loop half-period (ms)", None),
+    ("leader", "jitter_ms_p95"): ("OS scheduling jitter (ms)", None),
+    ("leader", "usb_ovh_ms"): ("Leader USB overhead (ms)", None),
+    ("leader", "pkt_ms"): ("Command packetization (ms)", None),
+    ("network", "rtt_ms_p50"): ("Network RTT (ms)", None),
+    ("follower", "usb_ovh_ms"): ("Follower USB overhead (ms)", None),
+    ("follower", "driver_ms"): ("Motor driver processing (ms)", None),
+    ("follower", "deadband_ms"): ("Servo command deadband (ms)", None),
+    ("follower", "backlash_ms"): ("Mechanical backlash/slop (ms)", None),
+    ("follower", "accel_visible_ms"): ("Motor accel to visible motion (ms)", None),
+    ("video", "exposure_ms"): ("Exposure/rolling-shutter share (ms)", None),
+    ("video", "frame_half_ms"): ("Camera frame half-period (ms)", None),
+    ("video", "encode_ms"): ("Encode latency (ms)", None),
+    ("video", "pkt_ms"): ("Packetization (ms)", None),
+    ("video", "fec_ms"): ("FEC/RED overhead (ms)", None),
+    ("video", "net_ms"): ("Video network one-way (ms)", None),
+    ("video", "jitterbuf_ms"): ("Jitter buffer target (ms)", None),
+    ("video", "decode_ms"): ("Decode latency (ms)", None),
+    ("video", "render_ms"): ("Renderer/compositor (ms)", None),
+    ("video", "vsync_ms"): ("Vsync avg wait (ms)", None),
+}
+
+# rate parameter (Hz) -> stored half-period (ms)
+HALF_PERIOD = {"Control loop rate (Hz)": "Control loop half-period (ms)", "Camera FPS (Hz)": "Camera frame half-period (ms)"}
+
+# Stored quantities that are not Inputs parameters: parameter <- (quantity, fn(value, get))
+DERIVED = {
+    **{hz: (q, lambda v, p: 1000.0 / (2.0 * v)) for hz, q in HALF_PERIOD.items()},
+    "Command network extra (ms)": ("Network RTT (ms)", lambda v, p: max(0.0, v / 2.0 - _fiber(p))),
+    "Extra network overhead (ms)": ("Video network one-way (ms)",
+                                    lambda v, p: max(0.0, v - _fiber(p) - p("TURN/SFU extra hops (ms)"))),
+}
+
+SERVER_STAGES = {"encode": "Encode latency (ms)", "jitter_buffer": "Jitter buffer target (ms)", "decode": "Decode latency (ms)"}
+
+def _measured(v):
+    """A usable measurement: a finite number >= 0 (0 is real, e.g. no FEC or an empty queue)."""
+    return isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) and v >= 0
+
+def run_values(doc, side="Leader"):
+    """{quantity: value} for one run/tool output, or {} when the format is not recognized."""
+    if doc.get("format") == "latency-hist/1":
+        h, meta = Histogram.from_dict(doc), doc.get("meta", {})
+        tool = meta.get("tool")
+        if not h.count: return {}
+        if tool == "serial_ping" and meta.get("mode", "stop-and-wait") == "stop-and-wait":
+            ser_ms = meta["payload"] * 8 / meta["baud"] * 1000.0 if meta.get("baud") else 0.0
+            return {f"{side} USB overhead (ms)": max(0.0, h.percentile(50) / 2.0 - ser_ms)}
+        if tool == "gpio_pulse" and meta.get("mode") == "capture":
+            return {"Motor driver processing (ms)": h.percentile(50)}
+        if tool == "opencv_frame_timer":
+            return {"Camera frame half-period (ms)": h.mean() / 2.0}
+        return {}
+    if isinstance(doc.get("inputs"), dict):
+        out = {}
+        for k, v in doc["inputs"].items():
+            if not _measured(v): continue
+            if k in HALF_PERIOD:
+                if v > 0: out[HALF_PERIOD[k]] = 1000.0 / (2.0 * v)
+            else:
+                out[k] = float(v)
+        return out
+    if isinstance(doc.get("stages"), list) and "counters" in doc:
+        out = {}
+        for r in doc["stages"]:
+            name = SERVER_STAGES.get(r.get("stage"))
+            if name and r.get("count"):
+                out[name] = float(r["p50_ms"])
+        return out
+    out = {}
+    for (section, key), (name, fn) in RUN_FIELDS.items():
+        v = (doc.get(section) or {}).get(key)
+        if _measured(v) and (v > 0 or name not in HALF_PERIOD.values()):   # a half-period of 0 has no rate
+            out[name] = fn(v) if fn else float(v)
+    return out
+
+class RunStore:
+    def __init__(self, root="runs"):
+        self.root = Path(root)
+        self.seg_dir = self.root / "segments"
+        self.state_path = self.root / "state.json"
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if self.state_path.exists():
+            st = json.loads(self.state_path.read_text())
+            st["hists"] = {k: Histogram.from_dict(v) for k, v in st["hists"].items()}
+            st["run_ids"] = set(st["run_ids"])
+            return st
+        return {"segment": 1, "segment_runs": 0, "runs": 0, "run_ids": set(), "hists": {}}
+
+    def save(self):
+        st = dict(self.state, hists={k: h.to_dict() for k, h in self.state["hists"].items()},
+                  run_ids=sorted(self.state["run_ids"]))
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(st, separators=(",", ":")))
+        os.replace(tmp, self.state_path)
+
+    def _record(self, values):
+        for name, v in values.items():
+            h = self.state["hists"].get(name)
+            if h is None:
+                h = self.state["hists"][name] = Histogram()
+            h.record(v)
+
+    def add(self, run_id, values, source=""):
+        """Append one run; returns False for an already ingested run_id or nothing to store."""
+        if not values or run_id in self.state["run_ids"]:
+            return False
+        st = self.state
+        if st["segment_runs"] >= SEGMENT_RUNS:
+            st["segment"] += 1
+            st["segment_runs"] = 0
+        self.seg_dir.mkdir(parents=True, exist_ok=True)
+        line = {"run_id": run_id, "ingested": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "source": source, "values": {k: round(v, 6) for k, v in values.items()}}
+        with open(self.seg_dir / f"{st['segment']:06d}.ndjson", "a") as f:
+            f.write(json.dumps(line, separators=(",", ":")) + "\n")
+        st["segment_runs"] += 1
+        st["runs"] += 1
+        st["run_ids"].add(run_id)
+        self._record(values)
+        return True
+
+    def ingest_file(self, path, side="Leader"):
+        raw = Path(path).read_bytes()
+        doc = json.loads(raw)
+        run_id = str(doc.get("run_id") or hashlib.sha256(raw).hexdigest()[:16])
+        return self.add(run_id, run_values(doc, side), source=Path(path).name)
+
+    def rebuild(self):
+        """Recompute state.json from the segments (after changing the mapping or losing state)."""
+        hists, ids, runs = {}, set(), 0
+        self.state.update({"hists": hists, "run_ids": ids})
+        segs = sorted(self.seg_dir.glob("*.ndjson"))
+        for seg in segs:
+            with open(seg) as f:
+                for line in f:
+                    rec = json.loads(line)
+                    ids.add(rec["run_id"])
+                    self._record(rec["values"])
+                    runs += 1
+        last = segs[-1] if segs else None
+        self.state.update({"runs": runs, "segment": int(last.stem) if last else 1,
+                           "segment_runs": sum(1 for _ in open(last)) if last else 0})
+
+    def percentiles(self, pct=PERCENTILES):
+        return {name: {"n": h.count, **{f"p{p:g}": round(h.percentile(p), 4) for p in pct}}
+                for name, h in sorted(self.state["hists"].items())}
+
+    def value(self, name, pct=50):
+        h = self.state["hists"].get(name)
+        return h.percentile(pct) if h is not None and h.count else None
+
+def measured_inputs(inputs, store, pct=50):
+    """Inputs table with a "measured" column: store percentile where measured, Typical otherwise.
+
+    A DERIVED parameter is only computed from its quantity when it was not measured directly."""
+    from latency_model import PARAMS
+    out = inputs.copy()
+    out["measured"] = out["typical"]
+    typical = out["typical"].to_dict()
+    for name in PARAMS:
+        v = store.value(name, pct)
+        if v is None and name in DERIVED:
+            q, fn = DERIVED[name]
+            qv = store.value(q, pct)
+            v = fn(qv, lambda n: typical[n]) if qv is not None else None
+        if v is not None and name in out.index:
+            out.loc[name, "measured"] = v
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["ingest", "query", "rebuild"])
+    ap.add_argument("files", nargs="*")
+    ap.add_argument("--store", default=os.environ.get("LATENCY_RUNS_DIR", "runs"))
+    ap.add_argument("--side", choices=["Leader", "Follower"], default="Leader", help="serial_ping snapshots: which USB link")
+    args = ap.parse_args()
+    store = RunStore(args.store)
+    if args.cmd == "ingest":
+        added = sum(store.ingest_file(p, args.side) for p in args.files)
+        store.save()
+        print(f"ingested {added}/{len(args.files)} (total runs {store.state['runs']})")
+    elif args.cmd == "rebuild":
+        store.rebuild()
+        store.save()
+        print(f"rebuilt from {store.state['runs']} runs")
+    else:
+        for name, r in store.percentiles().items():
+            print(f"{r['n']:6d}  p50={r['p50']:<10g} p95={r['p95']:<10g} p99={r['p99']:<10g} {name}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+One-at-a-time sensitivity (tornado) analysis over every Inputs parameter.
+
+Each parameter is swept to its Best and its Worst value while all others stay at Typical.
+All 2N sweeps plus the Typical baseline are columns of one parameter matrix, so the lane
+formulas are evaluated once for the whole batch. Output is ranked by swing (|Worst - Best|
+delta on Command→Photon) and written as JSON for the site.
+
+Usage:
+  python src/sensitivity_from_excel.py examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx site/data/latency_tornado.json
+"""
+import sys, json
+from pathlib import Path
+import numpy as np
+from latency_cache import load_inputs
+from latency_model import COST_COLOR, PARAMS, check_inputs, param_cost, stage_values, lane_totals
+
+def sweep_matrix(inputs, names=PARAMS):
+    """(n_params, 1 + 2*n_params): column 0 is Typical, column 1+2i sets param i to Best, 2+2i to Worst."""
+    typ = inputs.loc[names, "typical"].to_numpy(dtype=float)
+    X = np.repeat(typ[:, None], 1 + 2*len(names), axis=1)
+    i = np.arange(len(names))
+    X[i, 1 + 2*i] = inputs.loc[names, "best"].to_numpy(dtype=float)
+    X[i, 2 + 2*i] = inputs.loc[names, "worst"].to_numpy(dtype=float)
+    return X
+
+def tornado(inputs):
+    check_inputs(inputs, ["Best", "Typical", "Worst"])
+    X = sweep_matrix(inputs)
+    index = {name: k for k, name in enumerate(PARAMS)}
+    totals = lane_totals(stage_values(lambda name: X[index[name]]))
+    overall = sum(totals.values())
+    base = overall[0]
+    d_best, d_worst = overall[1::2] - base, overall[2::2] - base
+
+    rows = []
+    for k, name in enumerate(PARAMS):
+        cost = param_cost(inputs, name)
+        rows.append({
+            "param": name, "cost": cost, "color": COST_COLOR.get(cost),
+            "best": float(X[k, 1 + 2*k]), "typical": float(X[k, 0]), "worst": float(X[k, 2 + 2*k]),
+            "best_ms": round(float(d_best[k]), 3), "worst_ms": round(float(d_worst[k]), 3),
+            "swing_ms": round(float(abs(d_worst[k] - d_best[k])), 3),
+            "lanes": {lane: [round(float(t[1 + 2*k] - t[0]), 3), round(float(t[2 + 2*k] - t[0]), 3)]
+                      for lane, t in totals.items() if t[1 + 2*k] != t[0] or t[2 + 2*k] != t[0]},
+        })
+    rows.sort(key=lambda r: r["swing_ms"], reverse=True)
+    return {"scenario": "Typical", "base_ms": round(float(base), 3), "params": rows}
+
+def main():
+    excel = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("examples/Teleop_Latency_Model_SO100_WebRTC_v3.xlsx")
+    out = Path(sys.argv[2]) if len(sys.argv) > 2 else Path("site/data/latency_tornado.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    data = tornado(load_inputs(excel))
+    out.write_text(json.dumps(data, indent=2))
+    for r in data["params"][:5]:
+        print(f"{r['swing_ms']:8.2f} ms  {r['param']}")
+    print("Wrote", out)
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,18 @@
 Jetson GPIO pulse generator/listener.
 - TX mode: toggles a pin around a software event (e.g., just before USB write).
 - RX mode: timestamps pulses from a sensor/driver pin to correlate with scope/LA.
-Requires Jetson.GPIO (or adjust for RPi.GPIO).
+- Capture mode: streams every edge (pin, polarity, perf_counter_ns) through a preallocated ring
+  buffer to a binary file for hours-long runs; with --tx-pin each TX edge is paired with the next
+  RX edge of the same polarity (e.g. USB write toggle -> driver PWM, PLAN.md C) into a latency histogram.
+- Analyze mode: re-pair a capture file offline.
+Requires Jetson.GPIO (or adjust for RPi.GPIO); --backend sim needs nothing.
 """
-import argparse, time, statistics, sys
+import argparse, collections, heapq, os, random, struct, threading, time, sys
+from latency_hist import Histogram
+
+REC = struct.Struct("<qBB")     # t_ns (perf_counter_ns), pin, level (1 = rising, 0 = falling)
+MAGIC = b"GPE1"
+EDGE_LEVEL = {"rising": (1,), "falling": (0,), "both": (0, 1)}
 
 def tx(pin=18, hz=0, duration=1.0):
     import Jetson.GPIO as GPIO
@@ -24,28 +33,227 @@ def tx(pin=18, hz=0, duration=1.0):
             time.sleep(period/2)
     GPIO.cleanup()
 
-def rx(pin=16, duration=2.0):
+def rx(pin=16, duration=2.0, hist_out=None):
     import Jetson.GPIO as GPIO
     GPIO.setmode(GPIO.BOARD)
     GPIO.setup(pin, GPIO.IN)
-    edges = []
-    GPIO.add_event_detect(pin, GPIO.BOTH, callback=lambda ch: edges.append(time.perf_counter()))
+    hist = Histogram()
+    state = {"edges": 0, "last": None}
+    def on_edge(ch):
+        now = time.perf_counter()
+        if state["last"] is not None:
+            hist.record((now - state["last"]) * 1000.0)
+        state["last"] = now
+        state["edges"] += 1
+    GPIO.add_event_detect(pin, GPIO.BOTH, callback=on_edge)
     time.sleep(duration)
     GPIO.cleanup()
-    if edges:
-        diffs = [ (edges[i]-edges[i-1])*1000.0 for i in range(1,len(edges)) ]
-        print(f"edges={len(edges)} diff_ms_avg={statistics.mean(diffs):.3f}")
+    if hist.count:
+        print(f"edges={state['edges']} diff_ms_avg={hist.mean():.3f} p95={hist.percentile(95):.3f} "
+              f"p99={hist.percentile(99):.3f} p99.99={hist.percentile(99.99):.3f}")
+        if hist_out:
+            hist.dump(hist_out, tool="gpio_pulse", pin=pin)
     else:
         print("no edges captured")
 
+class JetsonBackend:
+    def __init__(self):
+        import Jetson.GPIO as GPIO
+        self.GPIO = GPIO
+        GPIO.setmode(GPIO.BOARD)
+
+    def watch(self, pins, callback):
+        """callback(t_ns, pin, level) for both edges on every pin; timestamp taken first."""
+        GPIO = self.GPIO
+        def on_edge(ch):
+            t = time.perf_counter_ns()
+            callback(t, ch, GPIO.input(ch))
+        for pin in pins:
+            GPIO.setup(pin, GPIO.IN)
+            GPIO.add_event_detect(pin, GPIO.BOTH, callback=on_edge)
+
+    def close(self):
+        self.GPIO.cleanup()
+
+class SimBackend:
+    """Square wave at `hz` on the first pin; the second pin follows after latency_ms ± jitter_ms."""
+    def __init__(self, hz=100.0, latency_ms=2.0, jitter_ms=0.2, seed=0):
+        self.hz, self.latency_ms, self.jitter_ms = hz, latency_ms, jitter_ms
+        self.rng = random.Random(seed)
+        self.stop = threading.Event()
+        self.th = None
+
+    def watch(self, pins, callback):
+        self.th = threading.Thread(target=self._run, args=(pins, callback), daemon=True)
+        self.th.start()
+
+    def _run(self, pins, callback):
+        half = 1e9 / self.hz / 2
+        t0, k, level, due = time.perf_counter_ns(), 0, 0, []
+        while not self.stop.is_set():
+            t_next = t0 + k * half
+            if not due or t_next <= due[0][0]:
+                level ^= 1
+                heapq.heappush(due, (t_next, pins[0], level))
+                if len(pins) > 1:
+                    lat = max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) * 1e6
+                    heapq.heappush(due, (t_next + lat, pins[1], level))
+                k += 1
+                continue
+            t, pin, lv = heapq.heappop(due)
+            wait = (t - time.perf_counter_ns()) / 1e9
+            if wait > 0: time.sleep(wait)
+            callback(time.perf_counter_ns(), pin, lv)
+
+    def close(self):
+        self.stop.set()
+        if self.th: self.th.join()
+
+BACKENDS = {"jetson": JetsonBackend, "sim": SimBackend}
+
+class EdgeRing:
+    """Preallocated ring of REC records. The GPIO callback only packs into it (no allocation);
+    the writer thread takes committed records in batches. Full ring -> edge dropped and counted."""
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.buf = bytearray(capacity * REC.size)
+        self.head = 0           # records pushed
+        self.tail = 0           # records released by the writer
+        self.overruns = 0
+        self._lock = threading.Lock()
+
+    def push(self, t_ns, pin, level):
+        with self._lock:
+            if self.head - self.tail >= self.capacity:
+                self.overruns += 1
+                return
+            REC.pack_into(self.buf, (self.head % self.capacity) * REC.size, t_ns, pin, level)
+            self.head += 1
+
+    def batch(self):
+        """(views, n): up to two memoryviews (around the wrap) covering all unreleased records."""
+        n = self.head - self.tail
+        if not n: return [], 0
+        start = self.tail % self.capacity
+        first = min(n, self.capacity - start)
+        mv = memoryview(self.buf)
+        views = [mv[start * REC.size:(start + first) * REC.size]]
+        if n > first: views.append(mv[:(n - first) * REC.size])
+        return views, n
+
+    def release(self, n):
+        self.tail += n
+
+class EdgePairer:
+    """Pairs each TX edge with the first later RX edge of the same level within max_ms."""
+    def __init__(self, tx_pin, rx_pin, edge="rising", max_ms=100.0):
+        self.tx_pin, self.rx_pin = tx_pin, rx_pin
+        self.levels = EDGE_LEVEL[edge]
+        self.max_ns = max_ms * 1e6
+        self.pending = collections.deque()
+        self.hist = Histogram()
+        self.unmatched_tx = self.unmatched_rx = 0
+
+    def feed(self, t_ns, pin, level):
+        if level not in self.levels: return
+        if pin == self.tx_pin:
+            self.pending.append((t_ns, level))
+            return
+        if pin != self.rx_pin: return
+        while self.pending and t_ns - self.pending[0][0] > self.max_ns:
+            self.pending.popleft(); self.unmatched_tx += 1
+        for i, (t_tx, lv) in enumerate(self.pending):
+            if lv == level:
+                del self.pending[i]
+                self.hist.record((t_ns - t_tx) / 1e6)
+                return
+        self.unmatched_rx += 1
+
+    def summary(self):
+        return f"tx->rx {self.hist.summary()} unmatched_tx={self.unmatched_tx} unmatched_rx={self.unmatched_rx}"
+
+def _writer(ring, f, pairer, stop, period=0.05):
+    while True:
+        done = stop.is_set()
+        views, n = ring.batch()
+        for v in views:
+            f.write(v)
+            if pairer:
+                for rec in REC.iter_unpack(v): pairer.feed(*rec)
+        ring.release(n)
+        if done: break
+        if not n: stop.wait(period)
+
+def capture(backend, rx_pin=16, tx_pin=None, edge="rising", out="edges.bin", duration=0.0,
+            ring_size=1 << 16, max_ms=100.0, hist_out=None):
+    """Stream edges to `out` until `duration` s (0 = Ctrl-C). Returns the pairer (None without tx_pin)."""
+    ring = EdgeRing(ring_size)
+    pairer = EdgePairer(tx_pin, rx_pin, edge, max_ms) if tx_pin is not None else None
+    stop = threading.Event()
+    with open(out, "wb") as f:
+        f.write(MAGIC)
+        th = threading.Thread(target=_writer, args=(ring, f, pairer, stop), daemon=True)
+        th.start()
+        backend.watch([p for p in (tx_pin, rx_pin) if p is not None], ring.push)
+        try:
+            time.sleep(duration) if duration > 0 else threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            backend.close()
+            stop.set()
+            th.join()
+    print(f"edges={ring.head} overruns={ring.overruns} file={out} ({os.path.getsize(out)} B)")
+    if pairer:
+        print(pairer.summary())
+        if hist_out and pairer.hist.count:
+            pairer.hist.dump(hist_out, tool="gpio_pulse", mode="capture", tx_pin=tx_pin, rx_pin=rx_pin, edge=edge)
+    return pairer
+
+def read_edges(path, chunk=1 << 16):
+    """Yield (t_ns, pin, level) from a capture file."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SystemExit(f"{path}: not a gpio_pulse capture")
+        while True:
+            data = f.read(chunk * REC.size)
+            if not data: break
+            yield from REC.iter_unpack(data[:len(data) - len(data) % REC.size])
+
+def analyze(path, tx_pin, rx_pin, edge="rising", max_ms=100.0):
+    pairer = EdgePairer(tx_pin, rx_pin, edge, max_ms)
+    for rec in read_edges(path): pairer.feed(*rec)
+    print(pairer.summary())
+    return pairer
+
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--mode", choices=["tx","rx"], required=True)
+    ap.add_argument("--mode", choices=["tx","rx","capture","analyze"], required=True)
     ap.add_argument("--pin", type=int, default=18)
     ap.add_argument("--hz", type=float, default=0)
-    ap.add_argument("--duration", type=float, default=1.0)
+    ap.add_argument("--duration", type=float, default=1.0, help="seconds (capture: 0 = until Ctrl-C)")
+    ap.add_argument("--hist-out", default=None, help="rx: edge intervals / capture: tx->rx latency histogram snapshot (JSON)")
+    cp = ap.add_argument_group("capture / analyze")
+    cp.add_argument("--tx-pin", type=int, default=None, help="pin toggled at the software event (pairs with --pin)")
+    cp.add_argument("--edge", choices=list(EDGE_LEVEL), default="rising")
+    cp.add_argument("--out", default="edges.bin", help="capture file (analyze: input)")
+    cp.add_argument("--ring", type=int, default=1 << 16, help="ring buffer size in edges")
+    cp.add_argument("--max-pair-ms", type=float, default=100.0)
+    cp.add_argument("--backend", choices=list(BACKENDS), default="jetson")
+    cp.add_argument("--sim-hz", type=float, default=100.0)
+    cp.add_argument("--sim-latency-ms", type=float, default=2.0)
+    cp.add_argument("--sim-jitter-ms", type=float, default=0.2)
     args = ap.parse_args()
     if args.mode == "tx":
         tx(pin=args.pin, hz=args.hz, duration=args.duration)
+    elif args.mode == "rx":
+        rx(pin=args.pin, duration=args.duration, hist_out=args.hist_out)
+    elif args.mode == "capture":
+        backend = (SimBackend(args.sim_hz, args.sim_latency_ms, args.sim_jitter_ms) if args.backend == "sim"
+                   else JetsonBackend())
+        capture(backend, rx_pin=args.pin, tx_pin=args.tx_pin, edge=args.edge, out=args.out, duration=args.duration,
+                ring_size=args.ring, max_ms=args.max_pair_ms, hist_out=args.hist_out)
     else:
-        rx(pin=args.pin, duration=args.duration)
+        if args.tx_pin is None:
+            raise SystemExit("analyze needs --tx-pin")
+        analyze(args.out, args.tx_pin, args.pin, args.edge, args.max_pair_ms)
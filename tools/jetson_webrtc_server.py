@@ -10,43 +10,334 @@ Gebruik:
   python tools/jetson_webrtc_server.py --device /dev/video0 --width 640 --height 480 --fps 30 --host 0.0.0.0 --port 8080
 Open dan http://<host>:8080/ in de browser en klik 'Start'.
 
+Broadcast (meerdere viewers): --broadcast --profile hd:h264:2500 --profile low:vp8:600
+Elk frame wordt één keer gecaptured en één keer per profiel (codec/bitrate) geëncodeerd; de
+pakketten gaan naar alle peers op dat profiel (?profile=low in de URL). Een trage viewer krijgt
+een eigen kleine wachtrij: loopt die vol, dan wordt die geleegd en wacht de viewer op het
+volgende keyframe, zonder de capture of andere viewers op te houden. Keyframe-verzoeken van
+viewers (RTCP PLI, na pakketverlies) gaan naar de encoder van hun profiel, maximaal één per
+--pli-interval s per profiel, zodat één slechte verbinding niet elk frame een keyframe afdwingt.
+
+Metrics: elk frame krijgt perf_counter-tijdstempels bij capture, pre-encode, post-encode en
+overdracht aan de RTP-sender; per stage/profiel in rollende histogrammen (laatste --metrics-window s).
+De server pollt pc.getStats() per peer (RTT, loss, jitter, bitrate) en de browserpagina stuurt
+zijn eigen inbound-rtp stats terug (jitter buffer, decode). Alles op /metrics (Prometheus) en
+/metrics.json. In de gewone (niet-broadcast) modus encodeert aiortc zelf: daar alleen capture_age.
+
 """
-import argparse, asyncio, json, os
+import argparse, asyncio, itertools, json, os, threading
+from fractions import Fraction
 from aiohttp import web
-from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+from aiortc import RTCPeerConnection, RTCRtpSender, RTCSessionDescription, VideoStreamTrack
 from aiortc.contrib.signaling import BYE
+from aiortc.mediastreams import MediaStreamError, MediaStreamTrack, VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
+import av
 from av import VideoFrame
+from av.video.frame import PictureType
 import cv2, numpy as np, time
+from latency_hist import RollingHistogram
 
-class CameraTrack(VideoStreamTrack):
-    kind = "video"
+# codec -> (PyAV encoder, WebRTC mimeType, encoder options)
+CODECS = {
+    "h264": ("libx264", "video/H264", {"preset": "ultrafast", "tune": "zerolatency", "profile": "baseline"}),
+    "vp8": ("libvpx", "video/VP8", {"deadline": "realtime", "cpu-used": "8", "lag-in-frames": "0"}),
+}
+
+class Metrics:
+    """Rollende histogrammen per (stage, profiel) in ms plus de laatste stats per peer."""
+    QUANTILES = (0.5, 0.95, 0.99)
+    def __init__(self, window=60.0):
+        self.window = window
+        self.hists = {}
+        self.totals = {}      # (stage, profile) -> [som ms, aantal] sinds start; Prometheus _sum/_count moeten monotoon zijn
+        self.peers = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, profile, ms):
+        with self._lock:
+            h = self.hists.get((stage, profile))
+            if h is None:
+                h = self.hists[(stage, profile)] = RollingHistogram(self.window)
+            h.record(ms)
+            t = self.totals.setdefault((stage, profile), [0.0, 0])
+            t[0] += ms
+            t[1] += 1
+
+    def snapshot(self, counters):
+        with self._lock:
+            snaps = [(k, h.snapshot(), list(self.totals[k])) for k, h in self.hists.items()]
+        stages = []
+        for (stage, profile), h, (total_ms, total) in snaps:
+            row = {"stage": stage, "profile": profile, "count": h.count, "total_count": total,
+                   "total_sum_ms": round(total_ms, 3)}
+            if h.count:
+                row["mean_ms"] = round(h.mean(), 3)
+                row.update({f"p{q*100:g}_ms": round(h.percentile(q * 100), 3) for q in self.QUANTILES})
+            stages.append(row)
+        return {"window_s": self.window, "stages": stages, "peers": self.peers, "counters": counters}
+
+    @classmethod
+    def prometheus(cls, snap):
+        lines = ["# TYPE webrtc_stage_ms summary"]
+        for r in snap["stages"]:
+            lab = f'stage="{r["stage"]}",profile="{r["profile"]}"'
+            if r["count"]:   # quantielen over het rollende venster
+                for q in cls.QUANTILES:
+                    lines.append(f'webrtc_stage_ms{{{lab},quantile="{q}"}} {r[f"p{q*100:g}_ms"]}')
+            lines.append(f"webrtc_stage_ms_sum{{{lab}}} {r['total_sum_ms']:.3f}")
+            lines.append(f"webrtc_stage_ms_count{{{lab}}} {r['total_count']}")
+        for name, v in snap["counters"].items():
+            lines += [f"# TYPE webrtc_{name} gauge", f"webrtc_{name} {v}"]
+        keys = sorted({k for st in snap["peers"].values() for k, v in st.items() if isinstance(v, (int, float))})
+        for k in keys:
+            lines.append(f"# TYPE webrtc_peer_{k} gauge")
+            for pid, st in snap["peers"].items():
+                if isinstance(st.get(k), (int, float)):
+                    lines.append(f'webrtc_peer_{k}{{peer="{pid}",profile="{st.get("profile", "")}"}} {st[k]}')
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+class FrameSlot:
+    """Eén-slot buffer: put() overschrijft het vorige frame (drop-oldest), get() wacht nooit."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+        self.seq = 0          # frames geschreven
+        self.dropped = 0      # overschreven voordat iemand ze ophaalde
+        self._taken = 0
+        self._cond = threading.Condition(self._lock)
+
+    def put(self, item):
+        with self._lock:
+            if self._item is not None and self._taken != self.seq:
+                self.dropped += 1
+            self._item = item
+            self.seq += 1
+            self._cond.notify_all()
+
+    def get(self):
+        with self._lock:
+            self._taken = self.seq
+            return self.seq, self._item
+
+    def wait_newer(self, seq, timeout=None):
+        """Als get(), maar wacht (max timeout s) tot er een frame nieuwer dan seq is."""
+        with self._lock:
+            self._cond.wait_for(lambda: self.seq > seq, timeout)
+            self._taken = self.seq
+            return self.seq, self._item
+
+class Camera:
+    """Capture-thread leest de camera en houdt alleen het nieuwste frame (BGR ndarray) vast in
+    een FrameSlot; CameraTrack (direct) en BroadcastEncoder lezen daaruit."""
     def __init__(self, device, width, height, fps):
-        super().__init__()
         self.cap = cv2.VideoCapture(device)
         if width and height:
             self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
             self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
         if fps:
             self.cap.set(cv2.CAP_PROP_FPS, fps)
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # geen driver-wachtrij voor de capture buffer
         self.fps = fps or 30
-        self._last = time.time()
+        self.size = (width or 640, height or 480)
+        self.slot = FrameSlot()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._capture, daemon=True)
+        self._thread.start()
+
+    def _capture(self):
+        while not self._stop.is_set():
+            ok, img = self.cap.read()
+            t_cap = time.perf_counter()
+            if not ok:
+                time.sleep(0.01)
+                continue
+            now_ms = int(time.time()*1000) % 100000
+            cv2.putText(img, f"{now_ms} ms", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,255), 2)
+            self.slot.put((t_cap, img))   # img wordt na put() niet meer beschreven
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self.cap.release()
+
+class CameraTrack(VideoStreamTrack):
+    """Per-peer track op de gedeelde Camera (directe modus): eigen pts-klok en per recv() een
+    nieuw VideoFrame, zodat aiortc's encoder-threads van verschillende peers nooit hetzelfde frame
+    delen. recv() wacht op een nieuwer capture-frame i.p.v. het vorige opnieuw te sturen; pacing
+    komt van next_timestamp() op --fps."""
+    kind = "video"
+    def __init__(self, camera):
+        super().__init__()
+        self.camera = camera
+        self.fps = camera.fps
+        self.seq = 0
+        self.dropped = 0   # capture-frames die deze peer oversloeg
+
+    async def next_timestamp(self):
+        # zelfde als aiortc, maar op self.fps i.p.v. vaste 30 fps
+        if self.readyState != "live":
+            raise MediaStreamError
+        if hasattr(self, "_timestamp"):
+            self._timestamp += int(VIDEO_CLOCK_RATE / self.fps)
+            wait = self._start + (self._timestamp / VIDEO_CLOCK_RATE) - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        else:
+            self._start = time.time()
+            self._timestamp = 0
+        return self._timestamp, VIDEO_TIME_BASE
 
     async def recv(self):
         pts, time_base = await self.next_timestamp()
-        ok, frame = self.cap.read()
-        if not ok:
-            img = np.zeros((480, 640, 3), dtype=np.uint8)
+        loop = asyncio.get_running_loop()
+        while True:
+            new, item = await loop.run_in_executor(None, self.camera.slot.wait_newer, self.seq, 0.5)
+            if self.readyState != "live":
+                raise MediaStreamError
+            if item is None or new > self.seq:
+                break
+        if item is None:   # nog geen camera-frame
+            w, h = self.camera.size
+            video_frame = VideoFrame.from_ndarray(np.zeros((h, w, 3), dtype=np.uint8), format="bgr24")
         else:
-            img = frame
-        now_ms = int(time.time()*1000) % 100000
-        cv2.putText(img, f"{now_ms} ms", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255,255,255), 2)
-        video_frame = VideoFrame.from_ndarray(img, format="bgr24")
+            self.dropped += max(0, new - self.seq - 1) if self.seq else 0
+            self.seq = new
+            t_cap, img = item
+            metrics.record("capture_age", "direct", (time.perf_counter() - t_cap) * 1000.0)
+            video_frame = VideoFrame.from_ndarray(img, format="bgr24")
         video_frame.pts = pts
         video_frame.time_base = time_base
-        await asyncio.sleep(max(0, 1.0/self.fps - (time.time()-self._last)))
-        self._last = time.time()
         return video_frame
 
+class BroadcastEncoder:
+    """Encodeert de nieuwste camera-frames één keer voor één profiel en verdeelt de pakketten
+    over alle geabonneerde PacketTracks. Draait op een eigen thread; wacht nooit op viewers."""
+    def __init__(self, name, codec, kbps, camera, loop, width=None, height=None, pli_interval=0.5):
+        encoder, self.mime, options = CODECS[codec]
+        self.name, self.camera, self.loop = name, camera, loop
+        w, h = width or camera.size[0], height or camera.size[1]
+        ctx = av.CodecContext.create(encoder, "w")
+        ctx.width, ctx.height, ctx.pix_fmt = w, h, "yuv420p"
+        ctx.time_base = VIDEO_TIME_BASE
+        ctx.framerate = Fraction(camera.fps, 1)
+        ctx.bit_rate = int(kbps * 1000)
+        ctx.gop_size = 2 * camera.fps
+        ctx.options = options
+        self.ctx = ctx
+        self.subs = set()
+        self.keyframe = threading.Event()
+        self.frames = 0
+        self.pli_interval = pli_interval
+        self._last_pli = float("-inf")
+        self.pli_received = self.pli_honored = 0
+        self._t0 = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def subscribe(self, track):
+        self.subs.add(track)
+        self.keyframe.set()
+
+    def unsubscribe(self, track):
+        self.subs.discard(track)
+
+    def request_keyframe(self):
+        """PLI of volle wachtrij van een viewer (event loop); gedempt tot één keyframe per pli_interval
+        voor het hele profiel."""
+        self.pli_received += 1
+        now = time.monotonic()
+        if now - self._last_pli >= self.pli_interval:
+            self._last_pli = now
+            self.pli_honored += 1
+            self.keyframe.set()
+
+    def _run(self):
+        seq = 0
+        while not self._stop.is_set():
+            new, item = self.camera.slot.wait_newer(seq, timeout=0.5)
+            if new == seq or item is None or not self.subs:
+                continue
+            seq = new
+            t_cap, img = item
+            t_pre = time.perf_counter()
+            metrics.record("capture_age", self.name, (t_pre - t_cap) * 1000.0)
+            now = time.time()
+            if self._t0 is None: self._t0 = now
+            out = VideoFrame.from_ndarray(img, format="bgr24").reformat(self.ctx.width, self.ctx.height, format="yuv420p")
+            out.pts = int((now - self._t0) * VIDEO_CLOCK_RATE)
+            out.time_base = VIDEO_TIME_BASE
+            if self.keyframe.is_set():
+                self.keyframe.clear()
+                out.pict_type = PictureType.I
+            packets = self.ctx.encode(out)
+            t_post = time.perf_counter()
+            metrics.record("encode", self.name, (t_post - t_pre) * 1000.0)
+            for packet in packets:
+                packet.time_base = VIDEO_TIME_BASE
+                for track in list(self.subs):
+                    self.loop.call_soon_threadsafe(track.push, (packet, t_cap, t_post))
+            self.frames += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+
+class PacketTrack(MediaStreamTrack):
+    """Per-peer track met al geëncodeerde pakketten (aiortc packetiseert alleen nog)."""
+    kind = "video"
+    def __init__(self, encoder, depth=8):
+        super().__init__()
+        self.encoder = encoder
+        self.queue = asyncio.Queue(maxsize=depth)
+        self.need_key = True
+        self.dropped = 0
+        encoder.subscribe(self)
+
+    def push(self, item):
+        # draait op de event loop, aangeroepen vanuit de encoder-thread; item = (packet, t_cap, t_post)
+        if self.need_key and not item[0].is_keyframe:
+            self.dropped += 1
+            return
+        if self.queue.full():
+            # trage viewer: wachtrij legen en opnieuw starten op het volgende keyframe
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.need_key = True
+            self.encoder.request_keyframe()   # gedempt: één trage viewer forceert niet elk frame een I-frame
+            return
+        self.need_key = False
+        self.queue.put_nowait(item)
+
+    async def recv(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+        packet, t_cap, t_post = await self.queue.get()
+        # de sender packetiseert en verstuurt direct na recv(): dit is het RTP-send moment
+        t_send = time.perf_counter()
+        metrics.record("send_queue", self.encoder.name, (t_send - t_post) * 1000.0)
+        metrics.record("capture_to_send", self.encoder.name, (t_send - t_cap) * 1000.0)
+        return packet
+
+    def stop(self):
+        super().stop()
+        self.encoder.unsubscribe(self)
+
+def route_pli(sender, encoder):
+    """aiortc (1.9) reageert op een PLI alleen met een eigen force-keyframe vlag, en die werkt enkel
+    als de track ruwe frames levert. Bij al geëncodeerde pakketten het verzoek naar de encoder sturen."""
+    orig = getattr(sender, "_send_keyframe", None)
+    if orig is None:
+        print("waarschuwing: RTCRtpSender._send_keyframe ontbreekt; PLI's worden genegeerd")
+        return
+    def send_keyframe():
+        orig()
+        encoder.request_keyframe()
+    sender._send_keyframe = send_keyframe
+
 INDEX_HTML = """<!doctype html>
 <html>
 <head>
@@ -65,9 +356,20 @@ async function start() {
   pc.ontrack = (ev) => { document.getElementById('v').srcObject = ev.streams[0]; };
   const offer = await pc.createOffer({offerToReceiveVideo: true});
   await pc.setLocalDescription(offer);
-  const resp = await fetch('/offer', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({sdp: pc.localDescription.sdp, type: pc.localDescription.type})});
+  const profile = new URLSearchParams(location.search).get('profile');
+  const resp = await fetch('/offer', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({sdp: pc.localDescription.sdp, type: pc.localDescription.type, profile})});
   const answer = await resp.json();
   await pc.setRemoteDescription(answer);
+  // eigen inbound-rtp stats (jitter buffer, decode) periodiek terug naar de server
+  setInterval(async () => {
+    const stats = {peer: answer.peer};
+    (await pc.getStats()).forEach(s => {
+      if (s.type === 'inbound-rtp' && s.kind === 'video')
+        for (const k of ['jitterBufferDelay', 'jitterBufferEmittedCount', 'totalDecodeTime', 'framesDecoded', 'framesDropped', 'packetsLost'])
+          stats[k] = s[k];
+    });
+    fetch('/stats', {method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify(stats)});
+  }, 2000);
 }
 document.getElementById('start').onclick = start;
 </script>
@@ -75,7 +377,10 @@ document.getElementById('start').onclick = start;
 </html>"""
 
 pcs = set()
-camera_track = None
+camera = None
+encoders = {}   # profielnaam -> BroadcastEncoder (alleen met --broadcast)
+peers = {}      # peer id -> (pc, profiel, PacketTrack of None)
+peer_ids = itertools.count(1)
 
 async def index(request):
     return web.Response(content_type="text/html", text=INDEX_HTML)
@@ -86,21 +391,106 @@ async def offer(request):
     pc = RTCPeerConnection()
     pcs.add(pc)
 
-    pc.addTrack(camera_track)
+    track, profile = None, "direct"
+    if encoders:
+        enc = encoders.get(params.get("profile")) or next(iter(encoders.values()))
+        track, profile = PacketTrack(enc), enc.name
+        sender = pc.addTrack(track)
+        route_pli(sender, enc)
+        # alleen de codec van het profiel aanbieden: de pakketten zijn al geëncodeerd
+        codecs = [c for c in RTCRtpSender.getCapabilities("video").codecs if c.mimeType == enc.mime]
+        next(t for t in pc.getTransceivers() if t.sender is sender).setCodecPreferences(codecs)
+    else:
+        track = CameraTrack(camera)
+        pc.addTrack(track)
+
+    pid = str(next(peer_ids))
+    peers[pid] = (pc, profile, track)
 
     @pc.on("iceconnectionstatechange")
     def on_ice():
         if pc.iceConnectionState in ["failed", "closed", "disconnected"]:
             pcs.discard(pc)
+            peers.pop(pid, None)
+            metrics.peers.pop(pid, None)
+            if track: track.stop()
 
     await pc.setRemoteDescription(offer)
     answer = await pc.createAnswer()
     await pc.setLocalDescription(answer)
-    return web.json_response({"sdp": pc.localDescription.sdp, "type": pc.localDescription.type})
+    return web.json_response({"sdp": pc.localDescription.sdp, "type": pc.localDescription.type, "peer": pid})
+
+async def client_stats(request):
+    """inbound-rtp stats van de browser: deltas -> jitter buffer en decode tijd per frame."""
+    s = await request.json()
+    pid = str(s.get("peer"))
+    if pid not in peers:
+        return web.json_response({"ok": False})
+    profile = peers[pid][1]
+    st = metrics.peers.setdefault(pid, {"profile": profile})
+    prev = st.pop("_client", None)
+    if prev:
+        emitted = (s.get("jitterBufferEmittedCount") or 0) - (prev.get("jitterBufferEmittedCount") or 0)
+        if emitted > 0:
+            st["jitter_buffer_ms"] = round(((s["jitterBufferDelay"] or 0) - (prev["jitterBufferDelay"] or 0)) / emitted * 1000, 3)
+            metrics.record("jitter_buffer", profile, st["jitter_buffer_ms"])
+        decoded = (s.get("framesDecoded") or 0) - (prev.get("framesDecoded") or 0)
+        if decoded > 0:
+            st["decode_ms"] = round(((s["totalDecodeTime"] or 0) - (prev["totalDecodeTime"] or 0)) / decoded * 1000, 3)
+            metrics.record("decode", profile, st["decode_ms"])
+    st["frames_dropped"] = s.get("framesDropped") or 0
+    st["_client"] = s
+    return web.json_response({"ok": True})
+
+async def poll_stats(interval):
+    """pc.getStats() per peer: outbound-rtp (bitrate) en remote-inbound-rtp (RTT, loss, jitter)."""
+    while True:
+        await asyncio.sleep(interval)
+        for pid, (pc, profile, track) in list(peers.items()):
+            try:
+                report = await pc.getStats()
+            except Exception:
+                continue
+            st = metrics.peers.setdefault(pid, {"profile": profile})
+            for s in report.values():
+                if s.type == "outbound-rtp":
+                    if "bytes_sent" in st:
+                        st["bitrate_kbps"] = round((s.bytesSent - st["bytes_sent"]) * 8 / interval / 1000, 1)
+                    st["bytes_sent"], st["packets_sent"] = s.bytesSent, s.packetsSent
+                elif s.type == "remote-inbound-rtp":
+                    # aiortc: roundTripTime in s, jitter in RTP-klok eenheden (90 kHz video)
+                    if s.roundTripTime is not None:
+                        st["rtt_ms"] = round(s.roundTripTime * 1000, 3)
+                        metrics.record("rtt", profile, st["rtt_ms"])
+                    st["jitter_ms"] = round(s.jitter / 90.0, 3)
+                    st["packets_lost"], st["fraction_lost"] = s.packetsLost, s.fractionLost
+            if track:
+                st["viewer_dropped"] = track.dropped
+
+def metrics_snapshot():
+    counters = {"peers": len(peers), "capture_frames": camera.slot.seq, "capture_dropped": camera.slot.dropped}
+    for name, enc in encoders.items():
+        counters[f"encoded_frames_{name}"] = enc.frames
+        counters[f"pli_received_{name}"] = enc.pli_received
+        counters[f"pli_keyframes_{name}"] = enc.pli_honored
+    snap = metrics.snapshot(counters)
+    snap["peers"] = {pid: {k: v for k, v in st.items() if not k.startswith("_")} for pid, st in snap["peers"].items()}
+    return snap
+
+async def metrics_prometheus(request):
+    return web.Response(text=Metrics.prometheus(metrics_snapshot()), content_type="text/plain")
+
+async def metrics_json(request):
+    return web.json_response(metrics_snapshot())
 
 async def on_shutdown(app):
+    if "stats_task" in app:
+        app["stats_task"].cancel()
     coros = [pc.close() for pc in pcs]
     await asyncio.gather(*coros)
+    for enc in encoders.values():
+        enc.stop()
+    camera.stop()
 
 def main():
     ap = argparse.ArgumentParser()
@@ -110,15 +500,37 @@ def main():
     ap.add_argument("--fps", type=int, default=30)
     ap.add_argument("--host", default="0.0.0.0")
     ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--broadcast", action="store_true", help="encode één keer per profiel, fan-out naar alle viewers")
+    ap.add_argument("--profile", action="append", default=None,
+                    help="naam:codec:kbps[:BxH], codec h264|vp8 (herhaalbaar; default main:h264:2000)")
+    ap.add_argument("--pli-interval", type=float, default=0.5, help="broadcast: min. seconden tussen PLI-keyframes per profiel")
+    ap.add_argument("--metrics-window", type=float, default=60.0, help="seconden per rollend histogram")
+    ap.add_argument("--stats-interval", type=float, default=2.0, help="seconden tussen pc.getStats() polls")
     args = ap.parse_args()
+    metrics.window = args.metrics_window
 
-    global camera_track
-    camera_track = CameraTrack(args.device, args.width, args.height, args.fps)
+    global camera
+    camera = Camera(args.device, args.width, args.height, args.fps)
 
     app = web.Application()
+    if args.broadcast:
+        async def start_encoders(app):
+            loop = asyncio.get_running_loop()
+            for spec in args.profile or ["main:h264:2000"]:
+                name, codec, kbps, *size = spec.split(":")
+                w, h = (int(x) for x in size[0].split("x")) if size else (None, None)
+                encoders[name] = BroadcastEncoder(name, codec, float(kbps), camera, loop, w, h,
+                                                  args.pli_interval)
+        app.on_startup.append(start_encoders)
+    async def start_polling(app):
+        app["stats_task"] = asyncio.create_task(poll_stats(args.stats_interval))
+    app.on_startup.append(start_polling)
     app.on_shutdown.append(on_shutdown)
     app.router.add_get("/", index)
     app.router.add_post("/offer", offer)
+    app.router.add_post("/stats", client_stats)
+    app.router.add_get("/metrics", metrics_prometheus)
+    app.router.add_get("/metrics.json", metrics_json)
     web.run_app(app, host=args.host, port=args.port)
 
 if __name__ == "__main__":
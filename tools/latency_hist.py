@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Compact latency histogram shared by the measurement tools (serial_ping, opencv_frame_timer, gpio_pulse).
+
+HDR-style log-bucketed counts in a fixed array: every power of two is split into 2^(sub_bits-1)
+linear sub-buckets, so any value is stored with < 2^-(sub_bits-1) relative error (0.8% at the
+default sub_bits=8). The defaults use 4608 counters (36 KiB), whatever the run length. record()
+is O(1), snapshots are sparse JSON and merge exactly, so hours-long soaks and leader/follower
+runs can be combined.
+
+CLI:
+  python tools/latency_hist.py show run.json
+  python tools/latency_hist.py merge leader.json follower.json -o both.json
+"""
+import json, sys, time
+from array import array
+
+FORMAT = "latency-hist/1"
+
+class Histogram:
+    def __init__(self, unit_ns=1000, sub_bits=8, max_bits=42):
+        self.unit_ns = unit_ns            # resolution of one count unit (default 1 µs)
+        self.sub_bits = sub_bits
+        self.half = 1 << (sub_bits - 1)
+        self.max_bits = max_bits
+        self.max_value = (1 << max_bits) - 1
+        self.counts = array("Q", bytes(8 * self.half * (max_bits - sub_bits + 2)))
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0                    # sum in units (for the mean)
+        self._scale = 1e6 / unit_ns       # ms -> units
+
+    def _index(self, v):
+        b = v.bit_length() - self.sub_bits
+        return v if b <= 0 else self.half * b + (v >> b)
+
+    def _value(self, idx):
+        """Midpoint (in units) of the bucket at idx."""
+        if idx < 2 * self.half:
+            return float(idx)
+        b = idx // self.half - 1
+        sub = idx - self.half * b
+        return ((sub << b) + ((sub + 1) << b) - 1) / 2.0
+
+    def record(self, ms, n=1):
+        v = int(ms * self._scale + 0.5)
+        if v < 0: v = 0
+        elif v > self.max_value: v = self.max_value
+        self.counts[self._index(v)] += n
+        self.count += n
+        self.total += v * n
+        if self.min is None or v < self.min: self.min = v
+        if self.max is None or v > self.max: self.max = v
+
+    def percentile(self, p):
+        """Value in ms at percentile p (0..100); p=0 and p=100 are the exact min and max."""
+        if not self.count:
+            return float("nan")
+        if p <= 0: return self.min / self._scale
+        if p >= 100: return self.max / self._scale
+        target = max(1, int(p / 100.0 * self.count + 0.5))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    v = min(max(self._value(idx), self.min), self.max)
+                    return v / self._scale
+        return self.max / self._scale
+
+    def mean(self):
+        return self.total / self.count / self._scale if self.count else float("nan")
+
+    def merge(self, other):
+        if (other.unit_ns, other.sub_bits, other.max_bits) != (self.unit_ns, self.sub_bits, self.max_bits):
+            raise ValueError("cannot merge histograms with different layouts")
+        for i, c in enumerate(other.counts):
+            if c: self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def to_dict(self):
+        return {"format": FORMAT, "unit_ns": self.unit_ns, "sub_bits": self.sub_bits, "max_bits": self.max_bits,
+                "count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "counts": {str(i): c for i, c in enumerate(self.counts) if c}}
+
+    @classmethod
+    def from_dict(cls, d):
+        if d.get("format") != FORMAT:
+            raise ValueError(f"not a {FORMAT} snapshot")
+        h = cls(d["unit_ns"], d["sub_bits"], d["max_bits"])
+        for i, c in d["counts"].items():
+            h.counts[int(i)] = c
+        h.count, h.total, h.min, h.max = d["count"], d["total"], d["min"], d["max"]
+        return h
+
+    def dump(self, path, **meta):
+        """Write a snapshot; extra keyword args are stored under "meta" (tool, host, params)."""
+        d = self.to_dict()
+        if meta: d["meta"] = meta
+        with open(path, "w") as f:
+            json.dump(d, f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def summary(self, prefix="ms"):
+        if not self.count:
+            return "n=0"
+        return (f"{prefix}_avg={self.mean():.3f} p50={self.percentile(50):.3f} p95={self.percentile(95):.3f} "
+                f"p99={self.percentile(99):.3f} p99.99={self.percentile(99.99):.3f} "
+                f"min={self.min / self._scale:.3f} max={self.max / self._scale:.3f} n={self.count}")
+
+class RollingHistogram:
+    """Recent values only: two Histograms rotated every `window` seconds, so a snapshot covers
+    the last window..2*window seconds. For long-running services (metrics endpoints)."""
+    def __init__(self, window=60.0, **layout):
+        self.window, self._layout = window, layout
+        self.cur, self.prev = Histogram(**layout), Histogram(**layout)
+        self._t = time.monotonic()
+
+    def record(self, ms):
+        now = time.monotonic()
+        if now - self._t >= self.window:
+            self.prev = self.cur if now - self._t < 2 * self.window else Histogram(**self._layout)
+            self.cur = Histogram(**self._layout)
+            self._t = now
+        self.cur.record(ms)
+
+    def snapshot(self):
+        return Histogram(**self._layout).merge(self.prev).merge(self.cur)
+
+if __name__ == "__main__":
+    import argparse   # CLI only: every probe imports this module
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sp = sub.add_parser("show"); sp.add_argument("files", nargs="+")
+    mp = sub.add_parser("merge"); mp.add_argument("files", nargs="+"); mp.add_argument("-o", "--out", required=True)
+    args = ap.parse_args()
+    hists = [Histogram.load(p) for p in args.files]
+    if args.cmd == "show":
+        for p, h in zip(args.files, hists):
+            print(f"{p}: {h.summary()}")
+    else:
+        total = hists[0]
+        for h in hists[1:]: total.merge(h)
+        total.dump(args.out, merged_from=args.files)
+        print(f"{args.out}: {total.summary()}", file=sys.stderr)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Control-loop period / OS scheduling jitter profiler (PLAN.md A: "Control loop sched avg",
+"OS scheduling jitter (ms)" = p95 of |loop interval - ideal period|).
+
+Runs a loop at --hz with each sleep strategy and records the wake-up time of every iteration
+into a preallocated array (analysis happens after the run):
+  sleep      time.sleep(deadline - now), like a plain Python control loop
+  hybrid     sleep until --spin-us before the deadline, then busy-wait
+  nanosleep  clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, deadline)
+Optionally with SCHED_FIFO (--fifo PRIO, needs root/CAP_SYS_NICE) and CPU pinning (--cpu N).
+The loop body is synthetic (--work-ms busy time) or your own (--hook module:function).
+
+The strategy with the lowest p99 jitter is reported and its numbers are written as Inputs
+parameters ("Control loop rate (Hz)", "OS scheduling jitter (ms)") with --out.
+
+Usage:
+  python tools/loop_jitter.py --hz 120 --duration 10 --cpu 3 --fifo 50 --out loop_jitter.json
+"""
+import argparse, ctypes, errno, importlib, json, os, sys, time
+from array import array
+from latency_hist import Histogram
+
+CLOCK = time.CLOCK_MONOTONIC
+TIMER_ABSTIME = 1
+
+class _timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+def _libc():
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.clock_nanosleep.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_timespec), ctypes.c_void_p]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+def now_ns():
+    return time.clock_gettime_ns(CLOCK)
+
+def sleep_plain(deadline, spin_ns):
+    dt = deadline - now_ns()
+    if dt > 0: time.sleep(dt / 1e9)
+
+def sleep_hybrid(deadline, spin_ns):
+    dt = deadline - spin_ns - now_ns()
+    if dt > 0: time.sleep(dt / 1e9)
+    while now_ns() < deadline: pass
+
+def make_nanosleep():
+    libc = _libc()
+    if libc is None: return None
+    ts = _timespec()
+    def sleep_abs(deadline, spin_ns):
+        ts.tv_sec, ts.tv_nsec = divmod(deadline, 1_000_000_000)
+        while libc.clock_nanosleep(CLOCK, TIMER_ABSTIME, ctypes.byref(ts), None) == errno.EINTR: pass
+    return sleep_abs
+
+def busy_work(ms):
+    ns = int(ms * 1e6)
+    def work():
+        end = now_ns() + ns
+        while now_ns() < end: pass
+    return work if ns > 0 else (lambda: None)
+
+def load_hook(spec):
+    mod, _, fn = spec.partition(":")
+    return getattr(importlib.import_module(mod), fn or "step")
+
+def set_realtime(cpu=None, fifo=0):
+    """Pin to `cpu` and/or switch to SCHED_FIFO `fifo`; returns a note for the report."""
+    notes = []
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+        notes.append(f"cpu={cpu}")
+    if fifo:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(fifo))
+            notes.append(f"SCHED_FIFO/{fifo}")
+        except PermissionError:
+            print("warn: SCHED_FIFO needs root or CAP_SYS_NICE; running SCHED_OTHER", file=sys.stderr)
+    return " ".join(notes) or "default"
+
+def run_loop(sleep_fn, hz, iters, work, spin_ns=500_000):
+    """Wake times (ns) of `iters` iterations scheduled on an absolute grid of 1/hz."""
+    period = int(1e9 / hz)
+    wake = array("q", bytes(8 * iters))
+    deadline = now_ns() + period
+    for i in range(iters):
+        sleep_fn(deadline, spin_ns)
+        wake[i] = now_ns()
+        work()
+        deadline += period
+    return wake, period
+
+def analyze(wake, period):
+    interval, dev, late = Histogram(), Histogram(), Histogram()
+    overruns = 0
+    for i in range(1, len(wake)):
+        d = wake[i] - wake[i - 1]
+        interval.record(d / 1e6)
+        dev.record(abs(d - period) / 1e6)   # own histogram: bucket width scales with the deviation, not the period
+        if d > 2 * period: overruns += 1
+    t0 = wake[0]
+    for i in range(len(wake)):
+        late.record(max(0, wake[i] - (t0 + i * period)) / 1e6)
+    return {
+        "interval_ms_avg": round(interval.mean(), 4),
+        "interval_ms_p50": round(interval.percentile(50), 4),
+        "interval_ms_p95": round(interval.percentile(95), 4),
+        "interval_ms_p99": round(interval.percentile(99), 4),
+        "interval_ms_max": round(interval.percentile(100), 4),
+        "jitter_ms_p95": round(dev.percentile(95), 4),
+        "jitter_ms_p99": round(dev.percentile(99), 4),
+        "lateness_ms_p50": round(late.percentile(50), 4),
+        "lateness_ms_p99": round(late.percentile(99), 4),
+        "overruns": overruns,
+        "achieved_hz": round(1e9 * (len(wake) - 1) / max(wake[-1] - wake[0], 1), 2),
+    }
+
+STRATEGIES = {"sleep": lambda: sleep_plain, "hybrid": lambda: sleep_hybrid, "nanosleep": make_nanosleep}
+
+def profile(hz=120.0, duration=5.0, strategies=("sleep", "hybrid", "nanosleep"), work_ms=0.0, hook=None,
+            spin_us=500.0, cpu=None, fifo=0):
+    sched = set_realtime(cpu, fifo)
+    work = load_hook(hook) if hook else busy_work(work_ms)
+    iters = max(2, int(hz * duration))
+    results = {}
+    for name in strategies:
+        fn = STRATEGIES[name]()
+        if fn is None:
+            print(f"warn: {name} not available on this platform", file=sys.stderr)
+            continue
+        wake, period = run_loop(fn, hz, iters, work, int(spin_us * 1000))
+        results[name] = analyze(wake, period)
+    if not results:
+        raise SystemExit(f"no sleep strategy available here (tried: {', '.join(strategies)})")
+    best = min(results, key=lambda n: results[n]["jitter_ms_p99"])
+    r = results[best]
+    return {"hz": hz, "duration_s": duration, "sched": sched, "work": hook or f"busy {work_ms} ms",
+            "strategies": results, "best": best,
+            "inputs": {"Control loop rate (Hz)": r["achieved_hz"], "OS scheduling jitter (ms)": r["jitter_ms_p95"]}}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--hz", type=float, default=120.0, help="target loop rate")
+    ap.add_argument("--duration", type=float, default=5.0, help="seconds per strategy")
+    ap.add_argument("--strategies", default="sleep,hybrid,nanosleep")
+    ap.add_argument("--work-ms", type=float, default=0.0, help="synthetic busy time per iteration")
+    ap.add_argument("--hook", default=None, help="module:function called every iteration instead of --work-ms")
+    ap.add_argument("--spin-us", type=float, default=500.0, help="hybrid: busy-wait window before the deadline")
+    ap.add_argument("--cpu", type=int, default=None, help="pin to this CPU")
+    ap.add_argument("--fifo", type=int, default=0, help="SCHED_FIFO priority (1-99), 0 = off")
+    ap.add_argument("--out", default=None, help="write report JSON (with Inputs parameters) here")
+    args = ap.parse_args()
+    strategies = [n for n in args.strategies.split(",") if n]
+    for n in strategies:
+        if n not in STRATEGIES:
+            ap.error(f"unknown strategy {n!r}; choose from {', '.join(STRATEGIES)}")
+    res = profile(args.hz, args.duration, strategies, args.work_ms, args.hook,
+                  args.spin_us, args.cpu, args.fifo)
+    print(f"hz={args.hz:g} sched={res['sched']} work={res['work']}")
+    for name, r in res["strategies"].items():
+        print(f"  {name:<10} interval_ms_p50={r['interval_ms_p50']:.3f} p99={r['interval_ms_p99']:.3f} "
+              f"max={r['interval_ms_max']:.3f} jitter_ms_p95={r['jitter_ms_p95']:.3f} p99={r['jitter_ms_p99']:.3f} "
+              f"overruns={r['overruns']}")
+    print(f"best={res['best']}  " + "  ".join(f"{k}={v:g}" for k, v in res["inputs"].items()))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(res, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -8,3 +8,5 @@ echo "=== iperf3 up/down (server required) ==="
 echo "Run iperf3 -s on the other end, then:"
 echo "  iperf3 -c <server> -t $DUR"
 echo "  iperf3 -c <server> -t $DUR -R"
+echo "=== UDP one-way / loss / bufferbloat (udp_probe server on 5202) ==="
+echo "  python3 tools/udp_probe.py client --host <server> --rate 120 --duration $DUR --load iperf3"
@@ -2,36 +2,191 @@
 """
 Measure app-side frame arrival intervals and jitter from a camera/URL.
 Useful for sanity-checking FPS and arrival jitter. For WebRTC, prefer getStats.
+
+--driver: a dedicated grab thread dequeues frames as soon as the driver has them and logs the
+driver timestamp (CAP_PROP_POS_MSEC; for V4L2 this is the buffer timestamp on CLOCK_MONOTONIC)
+next to the host arrival time. Reports driver vs host intervals, dropped/duplicated frames and,
+when both are on the same clock, frame age at arrival = the "Capture buffer (ms)" stage.
+It also infers the effective buffer depth: stop reading so the queue fills, then count how
+many grabs return immediately. --buffersizes 1,2,4 repeats this per CAP_PROP_BUFFERSIZE for
+comparison; "Capture buffer (ms)" in --out comes from --use-buffersize (default: the first size).
+--consumer-ms runs a simulated per-frame processing step in the main thread, concurrently with
+the grab thread: it always takes the newest grabbed frame, and the report adds how many frames it
+skipped and the latency from grab to end of processing.
 Requires: opencv-python
 """
-import argparse, time, statistics, cv2
+import argparse, json, statistics, threading, time, cv2
+from array import array
+from latency_hist import Histogram
 
-def main(src=0, warmup=30, samples=300):
-    cap = cv2.VideoCapture(src)
-    if not cap.isOpened():
-        raise SystemExit(f"Cannot open source: {src}")
+def main(src=0, warmup=30, samples=300, hist_out=None):
+    cap = open_source(src)
     for _ in range(warmup):
         ret, _ = cap.read()
         if not ret: break
-    times = []
+    hist = Histogram()
     last = time.perf_counter()
     for i in range(samples):
         ret, frame = cap.read()
         if not ret: break
         now = time.perf_counter()
-        times.append((now - last)*1000.0)
+        hist.record((now - last)*1000.0)
         last = now
     cap.release()
-    if not times:
+    if not hist.count:
         print("no frames"); return
-    mean = statistics.mean(times)
-    p95 = statistics.quantiles(times, n=20)[18]
-    print(f"inter_frame_ms_avg={mean:.2f} p95={p95:.2f} n={len(times)}")
+    print(f"inter_frame_ms_avg={hist.mean():.2f} p95={hist.percentile(95):.2f} p99={hist.percentile(99):.2f} "
+          f"max={hist.percentile(100):.2f} n={hist.count}")
+    if hist_out:
+        hist.dump(hist_out, tool="opencv_frame_timer", src=str(src))
+
+def open_source(src, buffersize=None):
+    cap = cv2.VideoCapture(int(src) if str(src).isdigit() else src)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open source: {src}")
+    if buffersize:
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, buffersize)
+    return cap
+
+class Grabber(threading.Thread):
+    """grab() in a loop; host time on CLOCK_MONOTONIC (ms), same clock as V4L2 buffer timestamps.
+    `count` frames are logged; consumers wait on `cond` for a newer one."""
+    def __init__(self, cap, samples):
+        super().__init__(daemon=True)
+        self.cap, self.samples = cap, samples
+        self.host = array("d", bytes(8 * samples))
+        self.drv = array("d", bytes(8 * samples))
+        self.count = 0
+        self.done = False
+        self.cond = threading.Condition()
+
+    def run(self):
+        for i in range(self.samples):
+            if not self.cap.grab(): break
+            self.host[i] = time.monotonic() * 1000.0
+            self.drv[i] = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            with self.cond:
+                self.count = i + 1
+                self.cond.notify()
+        with self.cond:
+            self.done = True
+            self.cond.notify()
+
+def consume(g, consumer_ms):
+    """Main-thread consumer: newest grabbed frame, `consumer_ms` of processing, repeat until the grabber ends."""
+    lat, taken, used, skipped = Histogram(), 0, 0, 0
+    while True:
+        with g.cond:
+            g.cond.wait_for(lambda: g.count > taken or g.done)
+            if g.count == taken: break
+            i = g.count - 1
+        skipped += i - taken
+        taken = i + 1
+        time.sleep(consumer_ms / 1000.0)
+        lat.record(time.monotonic() * 1000.0 - g.host[i])
+        used += 1
+    return {"consumed": used, "skipped": skipped,
+            "consumer_latency": {f"p{p}_ms": round(lat.percentile(p), 3) for p in (50, 95, 99)} if lat.count else {}}
+
+def analyze(host, drv, n, fps=0.0):
+    d_drv = [drv[i] - drv[i - 1] for i in range(1, n)]
+    pos = [d for d in d_drv if d > 0]
+    period = statistics.median(pos) if pos else (1000.0 / fps if fps else 0.0)
+    dups = sum(1 for d in d_drv if d <= 0)
+    drops = sum(max(0, round(d / period) - 1) for d in pos if d > 1.5 * period) if period else 0
+    offsets = [host[i] - drv[i] for i in range(n)]
+    same_clock = n > 0 and drv[0] > 0 and abs(statistics.median(offsets)) < 10_000
+    h_host, h_drv, h_age = Histogram(), Histogram(), Histogram()
+    for i in range(1, n):
+        h_host.record(host[i] - host[i - 1])
+        h_drv.record(max(0.0, d_drv[i - 1]))
+    if same_clock:
+        for o in offsets: h_age.record(max(0.0, o))
+    pct = lambda h: {f"p{p}_ms": round(h.percentile(p), 3) for p in (50, 95, 99)} if h.count else {}
+    return {"frames": n, "period_ms": round(period, 3), "dropped": drops, "duplicated": dups,
+            "driver_clock": "monotonic" if same_clock else "other",
+            "driver_interval": pct(h_drv), "host_interval": pct(h_host), "age": pct(h_age)}
+
+def probe_depth(cap, period_ms, pause=0.5, reps=3):
+    """Frames already queued after not reading for `pause` s: grabs faster than period/3."""
+    depths = []
+    for _ in range(reps):
+        time.sleep(pause)
+        fast = slow = 0
+        while slow < 3 and fast < 64:
+            t0 = time.perf_counter()
+            if not cap.grab(): return None
+            if (time.perf_counter() - t0) * 1000.0 < period_ms / 3:
+                if slow: break
+                fast += 1
+            else:
+                slow += 1
+        depths.append(fast)
+    return int(statistics.median(depths))
+
+def driver_timing(src=0, warmup=30, samples=300, buffersize=None, consumer_ms=0.0, log=None):
+    cap = open_source(src, buffersize)
+    for _ in range(warmup):
+        if not cap.grab(): break
+    g = Grabber(cap, samples)
+    g.start()
+    cons = consume(g, consumer_ms) if consumer_ms else None
+    g.join()
+    res = analyze(g.host, g.drv, g.count, cap.get(cv2.CAP_PROP_FPS))
+    res["buffersize"] = buffersize or int(cap.get(cv2.CAP_PROP_BUFFERSIZE) or 0)
+    res["consumer_ms"] = consumer_ms
+    if cons: res.update(cons)
+    if res["period_ms"]:
+        res["depth"] = probe_depth(cap, res["period_ms"])
+    cap.release()
+    if log:
+        with open(log, "w") as f:
+            f.write("frame,host_ms,driver_ms,age_ms\n")
+            for i in range(g.count):
+                f.write(f"{i},{g.host[i]:.3f},{g.drv[i]:.3f},{g.host[i] - g.drv[i]:.3f}\n")
+    return res
+
+def driver_line(r):
+    age = f"age_ms_p50={r['age']['p50_ms']:.2f} p95={r['age']['p95_ms']:.2f}" if r["age"] else "age=n/a (driver clock not monotonic)"
+    di, hi = r["driver_interval"], r["host_interval"]
+    return (f"buffersize={r['buffersize']} consumer_ms={r['consumer_ms']:g} frames={r['frames']} "
+            f"driver_interval_ms_p50={di.get('p50_ms', 0):.2f} p99={di.get('p99_ms', 0):.2f} "
+            f"host_interval_ms_p50={hi.get('p50_ms', 0):.2f} p99={hi.get('p99_ms', 0):.2f} {age} "
+            f"dropped={r['dropped']} dup={r['duplicated']} depth={r.get('depth')}"
+            + (f" consumer_skipped={r['skipped']}/{r['frames']} consumer_latency_ms_p50={r['consumer_latency']['p50_ms']:.2f}"
+               if r.get("consumer_latency") else ""))
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--src", default=0, help="camera index or URL")
     ap.add_argument("--samples", type=int, default=300)
     ap.add_argument("--warmup", type=int, default=30)
+    ap.add_argument("--hist-out", default=None, help="dump histogram snapshot (JSON) here")
+    dp = ap.add_argument_group("driver timestamps / buffer depth")
+    dp.add_argument("--driver", action="store_true", help="grab thread + driver timestamps, drops/dups, buffer depth")
+    dp.add_argument("--buffersizes", default=None, help="comma-separated CAP_PROP_BUFFERSIZE values to compare")
+    dp.add_argument("--use-buffersize", type=int, default=None,
+                    help="buffer size the pipeline uses: its age goes into --out inputs (default: first of --buffersizes)")
+    dp.add_argument("--consumer-ms", type=float, default=0.0, help="simulated processing per frame in a main-thread consumer")
+    dp.add_argument("--log", default=None, help="per-frame CSV (host_ms, driver_ms, age_ms)")
+    dp.add_argument("--out", default=None, help="summary JSON; includes 'Capture buffer (ms)' when ages are known")
     a = ap.parse_args()
-    main(a.src, a.warmup, a.samples)
+    if not (a.driver or a.buffersizes):
+        main(a.src, a.warmup, a.samples, a.hist_out)
+    else:
+        sizes = [int(x) for x in a.buffersizes.split(",")] if a.buffersizes else [None]
+        use = sizes[0] if a.use_buffersize is None else a.use_buffersize
+        if use not in sizes:
+            ap.error(f"--use-buffersize {use} is not in --buffersizes")
+        runs = []
+        for bs in sizes:
+            r = driver_timing(a.src, a.warmup, a.samples, bs, a.consumer_ms, a.log if len(sizes) == 1 else None)
+            print(driver_line(r))
+            runs.append(r)
+        if a.out:
+            out = {"tool": "opencv_frame_timer", "src": str(a.src), "runs": runs}
+            used = runs[sizes.index(use)]   # the other sizes are only for comparison
+            if used["age"]:
+                out["inputs"] = {"Capture buffer (ms)": used["age"]["p50_ms"]}
+            with open(a.out, "w") as f:
+                json.dump(out, f, indent=2)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for the USB-serial path: runs serial_ping modes over payload sizes and rates
+against the PTY echo emulator (serial_echo_sim.py, started as a subprocess) or a real device
+(--port), and compares with a stored baseline.
+
+Compared per case is the host-side overhead: measured roundtrip minus the emulator's idle-link
+roundtrip (serialization both ways + turnaround), so flush/read-timeout/reader-thread changes
+show up regardless of the emulated baud. A case regresses when
+  new > baseline + max(--abs-ms, --rel * baseline)
+for the gated overhead percentiles (--gate, default p50; tails are reported but swing by
+milliseconds with scheduler noise on shared CI hosts), or when it loses more frames than the
+baseline. --repeat N takes the per-metric median of N suite runs. Exit code 1 on regression.
+Baselines are machine-specific: regenerate with --update-baseline on the machine that runs the check.
+
+  python tools/serial_bench.py                          # compare with tools/serial_bench_baseline.json
+  python tools/serial_bench.py --update-baseline
+  python tools/serial_bench.py --port /dev/ttyACM0 --baseline esp32c3.json --update-baseline
+"""
+import argparse, contextlib, io, json, os, subprocess, sys
+from pathlib import Path
+import serial
+import serial_ping, serial_echo_sim
+
+HERE = Path(__file__).resolve().parent
+PAYLOADS = (8, 32, 128, 512)
+RATES = (100, 500, 1000)
+
+def start_emulator(a):
+    args = [sys.executable, str(HERE / "serial_echo_sim.py"), "--baud", str(a.baud), "--bits", str(a.bits),
+            "--per-byte-us", str(a.per_byte_us), "--turnaround-ms", str(a.turnaround_ms),
+            "--jitter-ms", str(a.jitter_ms), "--loss", str(a.loss)] + (["--seed", str(a.seed)] if a.seed is not None else [])
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return proc, proc.stdout.readline().strip()
+
+def case_result(hist, expected, lost=0):
+    out = {"n": hist.count, "expected_ms": round(expected, 4), "lost": lost}
+    for p in (50, 90, 99):
+        out[f"p{p}_ms"] = round(hist.percentile(p), 4)
+        out[f"overhead_p{p}_ms"] = round(hist.percentile(p) - expected, 4)
+    return out
+
+def median_cases(runs):
+    """Per case and metric the median over repeated suite runs."""
+    med = lambda v: sorted(v)[len(v) // 2]
+    return {name: {k: med([r[name][k] for r in runs]) for k in c} for name, c in runs[0].items()}
+
+def run_suite(port, a, expected):
+    cases = {}
+    for n in a.payloads:
+        with contextlib.redirect_stdout(io.StringIO()):
+            h = serial_ping.run(port, baud=a.baud, iters=a.iters, payload=n, timeout=0.2)
+        name = f"stop-and-wait_{n}B"
+        cases[name] = case_result(h, expected(n), a.iters - h.count)
+        print(f"{name:<24} {fmt(cases[name])}", flush=True)
+    ser = serial.Serial(port=port, baudrate=a.baud, timeout=0.05)
+    for r in a.rates:
+        st = serial_ping.run_windowed(ser, int(r * a.duration), 32, a.window, r)
+        name = f"window{a.window}_32B_{r:g}hz"
+        cases[name] = case_result(st["hist"], expected(32), st["lost"])
+        print(f"{name:<24} {fmt(cases[name])}", flush=True)
+    ser.close()
+    return cases
+
+def fmt(c):
+    return (f"rtt_ms p50={c['p50_ms']:.3f} p99={c['p99_ms']:.3f}  overhead_ms p50={c['overhead_p50_ms']:.3f} "
+            f"p90={c['overhead_p90_ms']:.3f} p99={c['overhead_p99_ms']:.3f}  lost={c['lost']}")
+
+def compare(cur, base, abs_ms, rel, gate=("p50",)):
+    """List of regression strings; cases missing from either side are skipped."""
+    out = []
+    for name, c in cur["cases"].items():
+        b = base["cases"].get(name)
+        if not b: continue
+        for m in (f"overhead_{g}_ms" for g in gate):
+            limit = b[m] + max(abs_ms, rel * abs(b[m]))
+            if c[m] > limit:
+                out.append(f"{name}: {m} {c[m]:.3f} > {limit:.3f} (baseline {b[m]:.3f})")
+        if c["lost"] > b["lost"]:
+            out.append(f"{name}: lost {c['lost']} > baseline {b['lost']}")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", default=None, help="real echo device instead of the emulator")
+    serial_echo_sim.add_args(ap)
+    ap.add_argument("--payloads", type=lambda s: [int(x) for x in s.split(",")], default=list(PAYLOADS))
+    ap.add_argument("--rates", type=lambda s: [float(x) for x in s.split(",")], default=list(RATES))
+    ap.add_argument("--iters", type=int, default=300, help="stop-and-wait roundtrips per payload")
+    ap.add_argument("--duration", type=float, default=2.0, help="seconds per windowed rate")
+    ap.add_argument("--window", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3, help="suite runs; per-metric median is compared")
+    ap.add_argument("--baseline", default=str(HERE / "serial_bench_baseline.json"))
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--gate", type=lambda s: s.split(","), default=["p50"], help="overhead percentiles to gate on: p50,p90,p99")
+    ap.add_argument("--abs-ms", type=float, default=0.5, help="absolute regression tolerance")
+    ap.add_argument("--rel", type=float, default=0.5, help="relative regression tolerance")
+    ap.add_argument("--out", default=None, help="write this run's JSON here")
+    a = ap.parse_args()
+
+    proc = None
+    if a.port:
+        port, device = a.port, {"port": a.port, "baud": a.baud}
+        expected = lambda n: serial_echo_sim.roundtrip_ms(n, a.baud, a.bits)
+    else:
+        proc, port = start_emulator(a)
+        device = {k: getattr(a, k) for k in ("baud", "bits", "per_byte_us", "turnaround_ms", "jitter_ms", "loss")}
+        expected = lambda n: serial_echo_sim.roundtrip_ms(n, a.baud, a.bits, a.per_byte_us, a.turnaround_ms)
+    try:
+        cases = median_cases([run_suite(port, a, expected) for _ in range(a.repeat)])
+        cur = {"tool": "serial_bench", "device": device, "repeat": a.repeat, "cases": cases}
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+    if a.out:
+        Path(a.out).write_text(json.dumps(cur, indent=2))
+    if a.update_baseline:
+        Path(a.baseline).write_text(json.dumps(cur, indent=2) + "\n")
+        print(f"baseline written: {os.path.relpath(a.baseline)}")
+        return 0
+    if not Path(a.baseline).exists():
+        print(f"no baseline at {a.baseline} (run with --update-baseline)")
+        return 0
+    base = json.loads(Path(a.baseline).read_text())
+    if base.get("device") != device:
+        print(f"warning: baseline device {base.get('device')} differs from {device}", file=sys.stderr)
+    bad = compare(cur, base, a.abs_ms, a.rel, a.gate)
+    for line in bad:
+        print("REGRESSION " + line)
+    print(f"{len(bad)} regression(s) vs {os.path.relpath(a.baseline)}")
+    return 1 if bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
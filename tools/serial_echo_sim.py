@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Pseudo-terminal stand-in for an echo device (tools/esp32c3_echo.ino), so serial_ping runs without hardware.
+
+The device side of a PTY pair echoes every chunk it reads, timed like a UART link:
+  rx_done = arrival + bytes*bits/baud          (queued behind earlier rx)
+  tx_done = rx_done + turnaround + bytes*per_byte + jitter + bytes*bits/baud   (queued behind earlier tx)
+so echoes stay in order and a flood builds up queueing delay like a real link. --loss drops whole
+chunks. A PTY has no real baud rate: the host side may open it at any --baud, only the emulator's
+--baud sets the timing. expected_ms(n) is the roundtrip of an n-byte frame on an idle link;
+serial_ping's result minus that is the host-side overhead.
+
+  python tools/serial_echo_sim.py --baud 1000000 --turnaround-ms 0.05 --jitter-ms 0.02
+  -> prints the PTY path (e.g. /dev/pts/7); then: python tools/serial_ping.py --port /dev/pts/7
+"""
+import argparse, collections, os, random, sys, threading, time, tty
+
+SPIN_S = 0.0005 if (os.cpu_count() or 1) > 1 else 0.0   # busy-wait the last bit; not on one core (starves the host side)
+
+def roundtrip_ms(n, baud, bits=10, per_byte_us=0.0, turnaround_ms=0.0):
+    """Idle-link roundtrip of an n-byte frame: serialization both ways + device processing."""
+    return 2 * n * bits / baud * 1000.0 + n * per_byte_us / 1000.0 + turnaround_ms
+
+class EchoDevice:
+    def __init__(self, baud=1_000_000, bits=10, per_byte_us=0.0, turnaround_ms=0.05, jitter_ms=0.0, loss=0.0, seed=None):
+        self.timing = (baud, bits, per_byte_us, turnaround_ms)
+        self.byte_s = bits / baud
+        self.per_byte = per_byte_us / 1e6
+        self.turnaround = turnaround_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.queue = collections.deque()
+        self.cv = threading.Condition()
+        self.rx_free = self.tx_free = 0.0
+        self.echoed = self.dropped = 0
+        self.master, slave = os.openpty()
+        tty.setraw(self.master); tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave   # keep open: the PTY goes away (EIO) when no slave fd is left
+
+    def expected_ms(self, n):
+        return roundtrip_ms(n, *self.timing)
+
+    def start(self):
+        for fn in (self._rx, self._tx):
+            threading.Thread(target=fn, daemon=True).start()
+        return self
+
+    def _rx(self):
+        while True:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                return
+            now = time.perf_counter()
+            n = len(data)
+            self.rx_free = max(now, self.rx_free) + n * self.byte_s
+            if self.loss and self.rng.random() < self.loss:
+                self.dropped += 1
+                continue
+            start = self.rx_free + self.turnaround + n * self.per_byte + (self.rng.random() * self.jitter if self.jitter else 0.0)
+            self.tx_free = max(start, self.tx_free) + n * self.byte_s
+            with self.cv:
+                self.queue.append((self.tx_free, data))
+                self.cv.notify()
+
+    def _tx(self):
+        while True:
+            with self.cv:
+                while not self.queue:
+                    self.cv.wait()
+                due, data = self.queue.popleft()
+            wait = due - time.perf_counter()
+            if wait > SPIN_S:
+                time.sleep(wait - SPIN_S)
+            while SPIN_S and time.perf_counter() < due:
+                pass
+            try:
+                os.write(self.master, data)
+            except OSError:
+                return
+            self.echoed += 1
+
+def add_args(ap):
+    ap.add_argument("--baud", type=int, default=1_000_000, help="emulated line rate")
+    ap.add_argument("--bits", type=int, default=10, help="bits per byte on the wire (8N1 = 10)")
+    ap.add_argument("--per-byte-us", type=float, default=0.0, help="device processing per byte")
+    ap.add_argument("--turnaround-ms", type=float, default=0.05, help="device rx->tx turnaround")
+    ap.add_argument("--jitter-ms", type=float, default=0.0, help="uniform extra delay 0..jitter per chunk")
+    ap.add_argument("--loss", type=float, default=0.0, help="probability a chunk is not echoed")
+    ap.add_argument("--seed", type=int, default=None)
+
+def from_args(a):
+    return EchoDevice(a.baud, a.bits, a.per_byte_us, a.turnaround_ms, a.jitter_ms, a.loss, a.seed)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    add_args(ap)
+    a = ap.parse_args()
+    dev = from_args(a).start()
+    print(dev.port, flush=True)
+    print(f"echo device on {dev.port}: roundtrip 32B idle = {dev.expected_ms(32):.3f} ms", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"echoed={dev.echoed} dropped={dev.dropped}", file=sys.stderr)
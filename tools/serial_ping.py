@@ -2,18 +2,27 @@
 """
 USB-serial roundtrip tester: measure write->echo->read latency, throughput, jitter.
 Use with a device that echoes back exactly what it receives.
+
+Default is stop-and-wait (idle roundtrip). --window N keeps up to N sequence-numbered
+frames in flight and matches echoes on a reader thread (loss/reordering detection);
+--rate HZ paces sends like the control loop, --sweep 100,250,500 reports latency vs rate.
 """
-import argparse, time, statistics, sys
+import argparse, time, struct, sys, threading
 import serial
+from latency_hist import Histogram
+
+MAGIC = b"\xa5\x5a"
+HEADER = struct.Struct("<IQ")   # seq, send time (perf_counter_ns)
+MIN_PAYLOAD = len(MAGIC) + HEADER.size
 
-def run(port, baud=1_000_000, iters=500, payload=32, rtscts=False, xonxoff=False, timeout=1.0):
+def run(port, baud=1_000_000, iters=500, payload=32, rtscts=False, xonxoff=False, timeout=1.0, hist_out=None):
     ser = serial.Serial(port=port, baudrate=baud, timeout=timeout, rtscts=rtscts, xonxoff=xonxoff)
     data = bytes([i % 256 for i in range(payload)])
     # warmup
     for _ in range(5):
         ser.write(data); ser.flush()
         ser.read(len(data))
-    samples = []
+    hist = Histogram()
     for i in range(iters):
         t0 = time.perf_counter()
         ser.write(data); ser.flush()
@@ -22,16 +31,122 @@ def run(port, baud=1_000_000, iters=500, payload=32, rtscts=False, xonxoff=False
         if len(got) != len(data):
             print(f"warn: short read at iter {i} ({len(got)}/{len(data)})", file=sys.stderr)
             continue
-        samples.append((t1 - t0) * 1000.0)
+        hist.record((t1 - t0) * 1000.0)
     ser.close()
-    if not samples:
+    if not hist.count:
         raise SystemExit("no samples")
-    avg = statistics.mean(samples)
-    p95 = statistics.quantiles(samples, n=20)[18]
-    print(f"roundtrip_ms_avg={avg:.3f} p95={p95:.3f} iters={len(samples)}")
+    print(f"roundtrip_ms_avg={hist.mean():.3f} p95={hist.percentile(95):.3f} p99={hist.percentile(99):.3f} "
+          f"p99.99={hist.percentile(99.99):.3f} iters={hist.count}")
+    if hist_out:
+        hist.dump(hist_out, tool="serial_ping", mode="stop-and-wait", port=port, baud=baud, payload=payload)
     # serialization estimate
     ser_ms = (payload * 8 / baud) * 1000.0
     print(f"serialization_ms_est={ser_ms:.3f} (payload={payload}B baud={baud})")
+    return hist
+
+def run_windowed(ser, count=1000, payload=32, window=8, rate=0.0, timeout=1.0):
+    """Send `count` sequence-numbered frames with at most `window` in flight, optionally paced at `rate` Hz.
+    A reader thread matches echoes by sequence number; a frame without echo after `timeout` s
+    gives up its window slot (counted in window_timeouts). Returns a stats dict."""
+    if payload < MIN_PAYLOAD:
+        raise SystemExit(f"windowed mode needs --payload >= {MIN_PAYLOAD}")
+    inflight = {}   # seq -> send time (ns), in send order
+    cond = threading.Condition()
+    seen = bytearray(count)
+    hist = Histogram()
+    stats = {"received": 0, "reordered": 0, "duplicates": 0, "resync_bytes": 0, "window_timeouts": 0}
+    stop = threading.Event()
+    last = {"seq": -1, "t_recv": 0}
+
+    def reader():
+        buf = bytearray()
+        while not stop.is_set():
+            chunk = ser.read(ser.in_waiting or 1)
+            t_recv = time.perf_counter_ns()
+            if not chunk:
+                continue
+            buf += chunk
+            while True:
+                i = buf.find(MAGIC)
+                if i < 0:
+                    stats["resync_bytes"] += max(0, len(buf) - 1)
+                    del buf[:max(0, len(buf) - 1)]
+                    break
+                if len(buf) - i < payload:
+                    stats["resync_bytes"] += i
+                    del buf[:i]
+                    break
+                seq, t_send = HEADER.unpack_from(buf, i + len(MAGIC))
+                stats["resync_bytes"] += i
+                del buf[:i + payload]
+                if seq >= count:
+                    continue
+                if seen[seq]:
+                    stats["duplicates"] += 1
+                    continue
+                seen[seq] = 1
+                if seq < last["seq"]:
+                    stats["reordered"] += 1
+                last["seq"] = max(last["seq"], seq)
+                hist.record((t_recv - t_send) / 1e6)
+                stats["received"] += 1
+                last["t_recv"] = t_recv
+                with cond:
+                    if inflight.pop(seq, None) is not None:
+                        cond.notify()
+
+    pkt = bytearray(MAGIC + bytes(i % 256 for i in range(payload - len(MAGIC))))
+    ser.reset_input_buffer()
+    th = threading.Thread(target=reader, daemon=True)
+    th.start()
+    timeout_ns = int(timeout * 1e9)
+    t0 = t_first = time.perf_counter_ns()
+    for seq in range(count):
+        with cond:
+            while True:
+                now = time.perf_counter_ns()
+                while inflight and now - next(iter(inflight.values())) >= timeout_ns:
+                    del inflight[next(iter(inflight))]   # echo lost: free its slot
+                    stats["window_timeouts"] += 1
+                if len(inflight) < window:
+                    break
+                cond.wait((next(iter(inflight.values())) + timeout_ns - now) / 1e9)
+        if rate > 0:
+            wait = (t0 + seq * 1e9 / rate - time.perf_counter_ns()) / 1e9
+            if wait > 0: time.sleep(wait)
+        t_send = time.perf_counter_ns()
+        if seq == 0: t_first = t_send
+        HEADER.pack_into(pkt, len(MAGIC), seq, t_send)
+        with cond:
+            inflight[seq] = t_send
+        ser.write(pkt)
+    t_sent = t_send if count else t_first
+    # drain: wait for outstanding echoes up to `timeout`
+    deadline = time.perf_counter() + timeout
+    while stats["received"] < count and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    stop.set()
+    th.join()
+
+    elapsed = max(last["t_recv"] - t0, 1) / 1e9
+    stats.update({
+        "sent": count, "lost": count - stats["received"], "payload": payload, "window": window,
+        "offered_hz": (count - 1) / max((t_sent - t_first) / 1e9, 1e-9) if count > 1 else 0.0,
+        "achieved_hz": stats["received"] / elapsed, "throughput_Bps": stats["received"] * payload / elapsed,
+        "hist": hist,
+    })
+    return stats
+
+def summarize(st):
+    h = st["hist"]
+    if h.count < 2:
+        return f"sent={st['sent']} received={st['received']} lost={st['lost']} (too few echoes)"
+    q = {p: h.percentile(p) for p in (50, 95, 99, 99.99)}
+    base = h.percentile(0)
+    return (f"offered_hz={st['offered_hz']:.1f} achieved_hz={st['achieved_hz']:.1f} throughput_Bps={st['throughput_Bps']:.0f} "
+            f"rtt_ms_p50={q[50]:.3f} p95={q[95]:.3f} p99={q[99]:.3f} p99.99={q[99.99]:.3f} min={base:.3f} "
+            f"queue_ms_p50={q[50] - base:.3f} p95={q[95] - base:.3f} "
+            f"sent={st['sent']} lost={st['lost']} reordered={st['reordered']} dup={st['duplicates']}")
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
@@ -41,5 +156,24 @@ if __name__ == "__main__":
     ap.add_argument("--payload", type=int, default=32)
     ap.add_argument("--rtscts", action="store_true")
     ap.add_argument("--xonxoff", action="store_true")
+    ap.add_argument("--window", type=int, default=0, help="windowed mode: max frames in flight")
+    ap.add_argument("--rate", type=float, default=0.0, help="windowed mode: send at fixed rate (Hz), e.g. control loop rate")
+    ap.add_argument("--sweep", default=None, help="comma-separated rates (Hz): latency vs offered rate")
+    ap.add_argument("--duration", type=float, default=5.0, help="seconds per rate with --sweep")
+    ap.add_argument("--hist-out", default=None, help="dump histogram snapshot (JSON) here; merge with tools/latency_hist.py")
     args = ap.parse_args()
-    run(args.port, baud=args.baud, iters=args.iters, payload=args.payload, rtscts=args.rtscts, xonxoff=args.xonxoff)
+    if not (args.window or args.rate or args.sweep):
+        run(args.port, baud=args.baud, iters=args.iters, payload=args.payload, rtscts=args.rtscts, xonxoff=args.xonxoff,
+            hist_out=args.hist_out)
+    else:
+        ser = serial.Serial(port=args.port, baudrate=args.baud, timeout=0.05, rtscts=args.rtscts, xonxoff=args.xonxoff)
+        window = args.window or 8
+        rates = [float(x) for x in args.sweep.split(",")] if args.sweep else [args.rate]
+        for r in rates:
+            st = run_windowed(ser, int(r * args.duration) if args.sweep else args.iters, args.payload, window, r)
+            print(summarize(st))
+            if args.hist_out:
+                path = args.hist_out.replace(".json", f"_{r:g}hz.json") if args.sweep else args.hist_out
+                st["hist"].dump(path, tool="serial_ping", mode="windowed", port=args.port, baud=args.baud,
+                                payload=args.payload, window=window, rate_hz=r)
+        ser.close()
@@ -1,7 +1,10 @@
 #!/usr/bin/env bash
-# setup_net_probe_server.sh - Setup iperf3/mtr/jq/chrony for latency measurement server
+# setup_net_probe_server.sh - Setup iperf3/mtr/jq/chrony + udp_probe echo for latency measurement server
 set -euo pipefail
 PORT="${PORT:-5201}"
+PROBE_PORT="${PROBE_PORT:-5202}"
+HERE="$(cd "$(dirname "$0")" && pwd)"
+RAW="${RAW:-https://raw.githubusercontent.com/koenvanwijk/latency/main/tools}"
 need_root() { if [ "$(id -u)" -ne 0 ]; then echo "Run as root (sudo)"; exit 1; fi; }
 pkg_detect() {
   if command -v apt-get >/dev/null 2>&1; then PKG=apt; return; fi
@@ -11,8 +14,8 @@ pkg_detect() {
 }
 install_pkgs() {
   case "$PKG" in
-    apt) apt-get update -y && apt-get install -y iperf3 mtr-tiny jq chrony && systemctl enable --now chrony || true;;
-    dnf|yum) $PKG -y install epel-release || true; $PKG -y install iperf3 mtr jq chrony && systemctl enable --now chronyd || true;;
+    apt) apt-get update -y && apt-get install -y iperf3 mtr-tiny jq chrony python3 && systemctl enable --now chrony || true;;
+    dnf|yum) $PKG -y install epel-release || true; $PKG -y install iperf3 mtr jq chrony python3 && systemctl enable --now chronyd || true;;
   esac
 }
 install_service() {
@@ -30,13 +33,39 @@ EOF
   systemctl daemon-reload
   systemctl enable --now "iperf3@${PORT}.service"
 }
+install_probe() {
+  # UDP echo for tools/udp_probe.py (one-way delay / loss / reordering)
+  # from the checkout next to this script, else from $RAW (script-only curl install)
+  install -d /opt/latency-probe
+  for f in udp_probe.py latency_hist.py; do
+    if [ -f "$HERE/$f" ]; then install -m 0644 "$HERE/$f" /opt/latency-probe/
+    elif ! curl -fsSL "$RAW/$f" -o "/opt/latency-probe/$f"; then
+      echo "WARN: $f not found next to this script or at $RAW; skipping udp_probe echo service" >&2
+      return 0
+    fi
+  done
+  chmod 0644 /opt/latency-probe/*.py
+  cat > /etc/systemd/system/udp-probe.service <<EOF
+[Unit]
+Description=udp_probe echo server on port ${PROBE_PORT}
+After=network-online.target
+[Service]
+Type=simple
+ExecStart=/usr/bin/python3 /opt/latency-probe/udp_probe.py server --port ${PROBE_PORT}
+Restart=on-failure
+[Install]
+WantedBy=multi-user.target
+EOF
+  systemctl daemon-reload
+  systemctl enable --now udp-probe.service
+}
 open_fw() {
-  if command -v ufw >/dev/null 2>&1; then ufw allow "${PORT}"/tcp && ufw allow "${PORT}"/udp
-  elif command -v firewall-cmd >/dev/null 2>&1; then firewall-cmd --add-port=${PORT}/tcp --permanent; firewall-cmd --add-port=${PORT}/udp --permanent; firewall-cmd --reload
-  elif command -v iptables >/dev/null 2>&1; then iptables -I INPUT -p tcp --dport ${PORT} -j ACCEPT; iptables -I INPUT -p udp --dport ${PORT} -j ACCEPT; fi
+  if command -v ufw >/dev/null 2>&1; then ufw allow "${PORT}"/tcp && ufw allow "${PORT}"/udp && ufw allow "${PROBE_PORT}"/udp
+  elif command -v firewall-cmd >/dev/null 2>&1; then firewall-cmd --add-port=${PORT}/tcp --permanent; firewall-cmd --add-port=${PORT}/udp --permanent; firewall-cmd --add-port=${PROBE_PORT}/udp --permanent; firewall-cmd --reload
+  elif command -v iptables >/dev/null 2>&1; then iptables -I INPUT -p tcp --dport ${PORT} -j ACCEPT; iptables -I INPUT -p udp --dport ${PORT} -j ACCEPT; iptables -I INPUT -p udp --dport ${PROBE_PORT} -j ACCEPT; fi
 }
 status() {
   PUBIP=$(curl -fsSL https://ifconfig.me || echo "<IP>")
-  echo "Server reachable at: ${PUBIP}:${PORT}"
+  echo "Server reachable at: ${PUBIP}:${PORT} (iperf3), udp_probe on ${PUBIP}:${PROBE_PORT}"
 }
-need_root; pkg_detect; install_pkgs; install_service; open_fw; status
+need_root; pkg_detect; install_pkgs; install_service; install_probe; open_fw; status
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+UDP one-way / RTT prober (asyncio) for "Command network extra (ms)".
+
+The client sends command-sized packets (--size, default 32 B) at the control rate with a sequence
+number and send timestamp; the server stamps receive and send time and echoes. Per packet
+(t1 client send, t2 server recv, t3 server send, t4 client recv):
+  rtt    = (t4 - t1) - (t3 - t2)
+  offset = ((t2 - t1) + (t3 - t4)) / 2        (NTP; median over the lowest-RTT 10%)
+  up     = t2 - t1 - offset,  down = t4 - t3 + offset
+Like NTP this assumes the fastest packets see a symmetric path; asymmetry ends up in the offset.
+With --same-clock (implied by loopback) the offset is taken as 0.
+Reports loss, reordering, duplicates and delay percentiles. --load runs the probe twice, idle
+and under load (built-in UDP flood to the server, or iperf3 against the probe host), so the
+difference shows bufferbloat.
+
+Server (e.g. on the host from setup_net_probe_server.sh, port 5202):
+  python tools/udp_probe.py server --port 5202
+Client:
+  python tools/udp_probe.py client --host <server> --rate 120 --duration 30 --load iperf3 --out probe.json
+Local stand-in (server in-process on 127.0.0.1, optional extra down-path delay):
+  python tools/udp_probe.py loopback --rate 2000 --delay-ms 5
+"""
+import argparse, asyncio, json, shutil, struct, sys, time
+from array import array
+from latency_hist import Histogram
+
+MAGIC = b"UPRB"      # probe: echoed
+LOAD = b"ULOD"       # load: dropped by the server
+HDR = struct.Struct("<4sIqqq")   # magic, seq, t1, t2, t3 (time_ns)
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+class EchoServer(asyncio.DatagramProtocol):
+    def __init__(self, delay_ms=0.0):
+        self.delay = delay_ms / 1000.0
+        self.echoed = self.load_bytes = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        t2 = time.time_ns()
+        if data[:4] != MAGIC:
+            self.load_bytes += len(data)
+            return
+        if len(data) < HDR.size:
+            return
+        buf = bytearray(data)
+        magic, seq, t1, _, _ = HDR.unpack_from(buf)
+        HDR.pack_into(buf, 0, magic, seq, t1, t2, time.time_ns())
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, buf, addr)
+        else:
+            self.transport.sendto(buf, addr)
+        self.echoed += 1
+
+class ProbeClient(asyncio.DatagramProtocol):
+    """Keeps t1..t4 per sequence number in preallocated arrays."""
+    def __init__(self, count):
+        self.count = count
+        self.t = [array("q", bytes(8 * count)) for _ in range(4)]
+        self.got = bytearray(count)
+        self.received = self.reordered = self.duplicates = 0
+        self.max_seq = -1
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        t4 = time.time_ns()
+        if len(data) < HDR.size or data[:4] != MAGIC:
+            return
+        _, seq, t1, t2, t3 = HDR.unpack_from(data)
+        if seq >= self.count:
+            return
+        if self.got[seq]:
+            self.duplicates += 1
+            return
+        self.got[seq] = 1
+        if seq < self.max_seq:
+            self.reordered += 1
+        self.max_seq = max(self.max_seq, seq)
+        for a, v in zip(self.t, (t1, t2, t3, t4)):
+            a[seq] = v
+        self.received += 1
+
+async def paced(transport, magic, count, rate, size):
+    """Send `count` packets at `rate`/s on an absolute schedule (bursts when the loop is late)."""
+    buf = bytearray(max(size, HDR.size))
+    t0 = time.perf_counter()
+    seq = 0
+    while seq < count:
+        due = min(count, int((time.perf_counter() - t0) * rate) + 1)
+        while seq < due:
+            HDR.pack_into(buf, 0, magic, seq, time.time_ns(), 0, 0)
+            transport.sendto(buf)
+            seq += 1
+        await asyncio.sleep(max(0.0, seq / rate - (time.perf_counter() - t0)))
+
+async def udp_load(host, port, mbps, duration, size=1200):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+    rate = mbps * 1e6 / 8 / size
+    try:
+        await paced(transport, LOAD, int(rate * duration), rate, size)
+    finally:
+        transport.close()
+
+async def iperf3_load(host, port, duration, reverse):
+    if not shutil.which("iperf3"):
+        raise SystemExit("iperf3 not found (needed for --load iperf3)")
+    args = ["iperf3", "-c", host, "-p", str(port), "-t", str(int(duration) + 1)] + (["-R"] if reverse else [])
+    proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    return proc
+
+def analyze(c, same_clock=False):
+    idx = [i for i in range(c.count) if c.got[i]]
+    t1, t2, t3, t4 = c.t
+    if not idx:
+        return {"sent": c.count, "received": 0, "lost": c.count}
+    rtt = sorted(((t4[i] - t1[i]) - (t3[i] - t2[i]), i) for i in idx)
+    best = rtt[:max(1, len(rtt) // 10)]
+    offs = sorted(((t2[i] - t1[i]) + (t3[i] - t4[i])) / 2 for _, i in best)
+    offset = 0 if same_clock else offs[len(offs) // 2]
+    h = {k: Histogram() for k in ("rtt", "up", "down")}
+    for r, i in rtt:
+        h["rtt"].record(r / 1e6)
+        h["up"].record(max(0.0, (t2[i] - t1[i] - offset) / 1e6))
+        h["down"].record(max(0.0, (t4[i] - t3[i] + offset) / 1e6))
+    out = {"sent": c.count, "received": c.received, "lost": c.count - c.received,
+           "loss_pct": round(100.0 * (c.count - c.received) / c.count, 3),
+           "reordered": c.reordered, "duplicates": c.duplicates, "clock_offset_ms": round(offset / 1e6, 3)}
+    for k, hist in h.items():
+        out[k] = {f"p{p:g}_ms": round(hist.percentile(p), 3) for p in PERCENTILES}
+        out[k]["min_ms"] = round(hist.percentile(0), 3)
+        out[k]["max_ms"] = round(hist.percentile(100), 3)
+        out[k]["mean_ms"] = round(hist.mean(), 3)
+    return out
+
+async def probe(host, port, rate, duration, size, same_clock=False, drain=1.0):
+    loop = asyncio.get_running_loop()
+    count = max(1, int(rate * duration))
+    transport, client = await loop.create_datagram_endpoint(lambda: ProbeClient(count), remote_addr=(host, port))
+    try:
+        await paced(transport, MAGIC, count, rate, size)
+        await asyncio.sleep(drain)
+    finally:
+        transport.close()
+    res = analyze(client, same_clock)
+    res.update({"rate_hz": rate, "size": max(size, HDR.size)})
+    return res
+
+async def run_client(args):
+    phases = {"idle": await probe(args.host, args.port, args.rate, args.duration, args.size, args.same_clock)}
+    if args.load != "none":
+        if args.load == "udp":
+            load = asyncio.ensure_future(udp_load(args.host, args.port, args.load_mbps, args.duration + 1))
+        else:
+            load = await iperf3_load(args.host, args.iperf_port, args.duration, args.load == "iperf3-r")
+        await asyncio.sleep(1.0)   # let the queue build up
+        phases["loaded"] = await probe(args.host, args.port, args.rate, args.duration, args.size, args.same_clock)
+        if isinstance(load, asyncio.Future):
+            await load
+        else:
+            await load.wait()
+    return phases
+
+def summary(name, r):
+    if not r.get("received"):
+        return f"{name}: no echoes (sent={r['sent']})"
+    return (f"{name}: rtt_ms p50={r['rtt']['p50_ms']:.3f} p99={r['rtt']['p99_ms']:.3f}  "
+            f"up_ms p50={r['up']['p50_ms']:.3f} p99={r['up']['p99_ms']:.3f}  "
+            f"down_ms p50={r['down']['p50_ms']:.3f} p99={r['down']['p99_ms']:.3f}  "
+            f"loss={r['loss_pct']:.2f}% reordered={r['reordered']} dup={r['duplicates']} offset_ms={r['clock_offset_ms']:.3f}")
+
+def report(phases, args):
+    for name, r in phases.items():
+        print(summary(name, r))
+    if "loaded" in phases and phases["loaded"].get("received") and phases["idle"].get("received"):
+        d = phases["loaded"]["rtt"]["p50_ms"] - phases["idle"]["rtt"]["p50_ms"]
+        print(f"bufferbloat: rtt p50 +{d:.3f} ms under load ({args.load})")
+    out = {"tool": "udp_probe", "host": args.host, "phases": phases}
+    idle = phases["idle"]
+    if args.fiber_ms is not None and idle.get("received"):
+        out["inputs"] = {"Command network extra (ms)": round(max(0.0, idle["up"]["p50_ms"] - args.fiber_ms), 3)}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(out, f, indent=2)
+
+async def serve(host, port, delay_ms):
+    loop = asyncio.get_running_loop()
+    transport, server = await loop.create_datagram_endpoint(lambda: EchoServer(delay_ms), local_addr=(host, port))
+    print(f"udp_probe server on {host}:{port}", file=sys.stderr)
+    return transport, server
+
+async def main(args):
+    if args.cmd == "server":
+        await serve(args.bind, args.port, args.delay_ms)
+        await asyncio.Event().wait()
+    elif args.cmd == "loopback":
+        args.host, args.same_clock = "127.0.0.1", True
+        transport, _ = await serve(args.host, args.port, args.delay_ms)
+        try:
+            report(await run_client(args), args)
+        finally:
+            transport.close()
+    else:
+        report(await run_client(args), args)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("cmd", choices=["server", "client", "loopback"])
+    ap.add_argument("--host", default="127.0.0.1", help="client: probe server")
+    ap.add_argument("--bind", default="0.0.0.0", help="server: listen address")
+    ap.add_argument("--port", type=int, default=5202)
+    ap.add_argument("--rate", type=float, default=120.0, help="packets/s (control loop rate)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    ap.add_argument("--size", type=int, default=32, help="packet size in bytes (min %d)" % HDR.size)
+    ap.add_argument("--load", choices=["none", "udp", "iperf3", "iperf3-r"], default="none",
+                    help="second phase under load: UDP flood to the server, or iperf3 up (-r: down)")
+    ap.add_argument("--load-mbps", type=float, default=20.0, help="--load udp rate")
+    ap.add_argument("--iperf-port", type=int, default=5201)
+    ap.add_argument("--delay-ms", type=float, default=0.0, help="server/loopback: extra delay on the echo path")
+    ap.add_argument("--same-clock", action="store_true", help="client and server share a clock (no offset estimate)")
+    ap.add_argument("--fiber-ms", type=float, default=None, help="speed-of-light one-way time; writes 'Command network extra (ms)'")
+    ap.add_argument("--out", default=None, help="write JSON here")
+    args = ap.parse_args()
+    try:
+        asyncio.run(main(args))
+    except KeyboardInterrupt:
+        pass
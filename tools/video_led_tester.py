@@ -8,19 +8,34 @@ waarin tegelijk de fysieke LED (bij de camera) en jouw scherm te zien zijn.
 Werkwijze:
 1) Neem een korte clip op waarin de LED snel aan/uit gaat en de browser (weergave) in beeld is.
 2) Geef twee ROI's op: één rond de LED, één rond het schermgebied waar de LED zichtbaar wordt.
-3) Script detecteert de eerste "aan" overgang in LED-ROI en de eerste "helder" frame in scherm-ROI.
-4) Delta_frames × (1000 / fps) = latency (ms).
+3) Script decodeert de clip één keer, meet beide ROI's per frame en detecteert alle aan/uit
+   overgangen in beide reeksen; elke LED-overgang wordt gekoppeld aan de volgende scherm-overgang.
+4) Delta_frames × (1000 / fps) = latency (ms) per toggle; rapport met mediaan, p95 en lijst.
 
 Gebruik:
   python tools/video_led_tester.py --video path/to/clip.mp4 \
       --led-roi x,y,w,h --scr-roi x,y,w,h --threshold 200 --fps 240
 
+Zonder ROI's: --auto-roi maakt eerst één verkleinde streaming pass (per-pixel temporele variantie,
+constant geheugen), kiest de twee sterkst knipperende gebieden en bepaalt via kruiscorrelatie
+welke voorloopt (= LED). Drempels worden dan per ROI automatisch gekozen. Het zoekvenster van de
+kruiscorrelatie blijft onder de halve knipperperiode (één toggle-interval): een blokgolf correleert
+ook op elke hele periode, dus de latentie moet korter zijn dan één toggle-interval.
+
+Lange clips: --workers N decodeert keyframe-uitgelijnde stukken parallel; --fast (PyAV)
+decodeert alleen naar grijs, eventueel op lagere resolutie met --lowres.
+
+Live: --live /dev/video0 leest de camera in een aparte capture thread (ring buffer, geen frame-
+allocaties per frame) en print periodiek een rolling mediaan/p95. Met --serial stuurt het script de
+ESP32 zelf aan ('B', of '0'/'1' met --blink-hz) en meet ook commando -> LED-aan.
+  python tools/video_led_tester.py --live 0 --fps 240 --led-roi ... --scr-roi ... --serial /dev/ttyACM0 --blink-hz 2
+
 Opmerkingen:
 - Als de video geen FPS meldt, geef je zelf --fps.
 - Demp je omgeving (geen grote lichtschommelingen).
-- Voor rolling‑shutter/exposure beïnvloeding kan je meerdere toggles doen en mediane waarde nemen.
+- Laat de LED knipperen (ESP32 'B'): elke toggle levert een sample, ook uit-overgangen.
 """
-import argparse, cv2, numpy as np
+import argparse, collections, threading, time, cv2, numpy as np
 
 def parse_roi(s):
     x,y,w,h = map(int, s.split(','))
@@ -30,57 +45,437 @@ def avg_luma(img):
     # Y' from BGR approx
     return float(0.114*img[:,:,0].mean() + 0.587*img[:,:,1].mean() + 0.299*img[:,:,2].mean())
 
-def detect_first_on(cap, roi, thresh, warm=5):
-    """Return (frame_index, luma_series) of first frame crossing threshold."""
-    x,y,w,h = roi
-    lumas = []
-    idx = -1
+def roi_lumas(cap, rois, warm=0):
+    """Eén decode-pass: per frame de gemiddelde luma van elke ROI. Returns array (len(rois), n_frames)."""
+    series = [[] for _ in rois]
     i = 0
     while True:
         ok, frame = cap.read()
         if not ok: break
-        if i < warm:
-            i += 1
-            continue
-        crop = frame[y:y+h, x:x+w]
-        l = avg_luma(crop)
-        lumas.append(l)
-        if idx < 0 and l >= thresh:
-            idx = i - warm
-            break
+        if i >= warm:
+            for out, (x,y,w,h) in zip(series, rois):
+                out.append(avg_luma(frame[y:y+h, x:x+w]))
+        i += 1
+    return np.array(series, dtype=float).reshape(len(rois), -1)
+
+def keyframe_ranges(video, parts):
+    """Splits de clip in hooguit `parts` frame-ranges die op een keyframe beginnen.
+    Met PyAV: keyframes uit de packets (alleen demuxen, niet decoderen); returns (ranges, pts).
+    Zonder PyAV: gelijke stukken op frame count (cv2 seekt dan vanaf de vorige keyframe); pts=None."""
+    try:
+        import av
+    except ImportError:
+        av = None
+    pts = None
+    if av is not None:
+        with av.open(video) as c:
+            st = c.streams.video[0]
+            all_pts, kf = [], []
+            for pkt in c.demux(st):
+                if pkt.pts is None: continue
+                all_pts.append(pkt.pts)
+                if pkt.is_keyframe: kf.append(pkt.pts)
+        pts = np.sort(np.array(all_pts, dtype=np.int64))
+        total = len(pts)
+        starts = np.searchsorted(pts, np.sort(kf))
+    else:
+        cap = cv2.VideoCapture(video)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        starts = np.arange(total)
+    if not len(starts):
+        return [(0, total)], pts
+    targets = np.linspace(0, total, parts + 1)[1:-1]
+    cuts = starts[np.minimum(np.searchsorted(starts, targets), len(starts) - 1)]
+    bounds = [0] + sorted(set(int(c) for c in cuts) - {0, total}) + [total]
+    return list(zip(bounds, bounds[1:])), pts
+
+def decode_range(video, rois, start, end, pts=None, lowres=0):
+    """Worker: ROI-luma voor frames [start, end). Returns array (len(rois), n).
+    pts gegeven -> PyAV-pad: grijs (alleen luma, geen BGR-conversie) en optioneel decoder 'lowres'."""
+    if pts is None:
+        cap = cv2.VideoCapture(video)
+        if start: cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        series = [[] for _ in rois]
+        for _ in range(end - start):
+            ok, frame = cap.read()
+            if not ok: break
+            for out, (x,y,w,h) in zip(series, rois):
+                out.append(avg_luma(frame[y:y+h, x:x+w]))
+        cap.release()
+        return np.array(series, dtype=float).reshape(len(rois), -1)
+    import av
+    lo_pts = int(pts[start])
+    hi_pts = int(pts[end]) if end < len(pts) else None
+    series = [[] for _ in rois]
+    with av.open(video) as c:
+        st = c.streams.video[0]
+        st.thread_type = "AUTO"
+        if lowres: st.codec_context.options = {"lowres": str(lowres)}
+        full_w = st.codec_context.width
+        if start: c.seek(lo_pts, stream=st, backward=True)
+        for frame in c.decode(st):
+            if frame.pts is None or frame.pts < lo_pts: continue
+            if hi_pts is not None and frame.pts >= hi_pts: break
+            img = frame.to_ndarray(format="gray")
+            f = frame.width / full_w if full_w else 1.0  # decoders zonder lowres geven gewoon volle resolutie
+            for out, (x,y,w,h) in zip(series, rois):
+                x0, y0 = int(x*f), int(y*f)
+                out.append(float(img[y0:y0+max(1, int(h*f)), x0:x0+max(1, int(w*f))].mean()))
+    return np.array(series, dtype=float).reshape(len(rois), -1)
+
+def roi_lumas_parallel(video, rois, workers, fast=False, lowres=0, warm=0):
+    """Decodeert keyframe-uitgelijnde stukken parallel in een process pool en voegt de ROI-reeksen op volgorde samen."""
+    from concurrent.futures import ProcessPoolExecutor
+    if lowres and min(min(w, h) for _, _, w, h in rois) >> lowres < 2:
+        raise SystemExit(f"ROI te klein voor --lowres {lowres}")
+    ranges, pts = keyframe_ranges(video, max(1, workers) * 4)
+    if fast and pts is None:
+        raise SystemExit("--fast vereist PyAV (pip install av)")
+    use_pts = pts if fast else None
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = [ex.submit(decode_range, video, rois, a, b, use_pts, lowres if fast else 0) for a, b in ranges]
+        parts = [f.result() for f in futs]
+    return np.concatenate(parts, axis=1)[:, warm:]
+
+def find_edges(lumas, thresh, hyst=0.0):
+    """Alle aan/uit overgangen: aan bij luma >= thresh, pas weer uit onder thresh - hyst.
+    Returns (frame_indices, polarity) met polarity +1 = aan (rising), -1 = uit (falling)."""
+    n = len(lumas)
+    hi = lumas >= thresh
+    lo = lumas < thresh - hyst
+    # laatste frame dat duidelijk aan of uit was -> toestand (tussenin: vorige toestand houden)
+    last = np.maximum.accumulate(np.where(hi | lo, np.arange(n), -1)) if n else np.zeros(0, dtype=int)
+    state = np.where(last >= 0, hi[np.maximum(last, 0)], False)
+    idx = np.flatnonzero(np.diff(state.astype(np.int8))) + 1
+    return idx, np.where(state[idx], 1, -1)
+
+def pair_edges(led, scr):
+    """Koppel elke LED-overgang aan de eerste scherm-overgang met dezelfde polariteit,
+    vóór de volgende LED-overgang met die polariteit. Returns lijst (led_idx, scr_idx, polarity)."""
+    pairs = []
+    for pol in (1, -1):
+        l = led[0][led[1] == pol]
+        s = scr[0][scr[1] == pol]
+        for k, li in enumerate(l):
+            j = np.searchsorted(s, li)
+            limit = l[k+1] if k + 1 < len(l) else np.inf
+            if j < len(s) and s[j] < limit:
+                pairs.append((int(li), int(s[j]), pol))
+    return sorted(pairs)
+
+def variance_map(video, scale=0.25, stride=1, warm=0):
+    """Eén streaming pass op verkleinde grijsbeelden: per-pixel temporele variantie (Welford).
+    Geheugen is constant (mean/M2 ter grootte van één verkleind frame), geen frame-stack."""
+    cap = cv2.VideoCapture(video)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open video: {video}")
+    n = i = 0
+    mean = m2 = delta = g = None
+    while cap.grab():
         i += 1
-    return idx, lumas
+        if i <= warm or (i - warm - 1) % stride: continue
+        ok, frame = cap.retrieve()
+        if not ok: break
+        small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if mean is None:
+            mean = np.zeros(small.shape, np.float32); m2 = np.zeros_like(mean)
+            delta = np.empty_like(mean); g = np.empty_like(mean)
+        g[...] = small
+        n += 1
+        np.subtract(g, mean, out=delta)
+        mean += delta / n
+        m2 += delta * (g - mean)
+    cap.release()
+    if mean is None:
+        raise SystemExit(f"no frames in {video}")
+    return m2 / max(n - 1, 1)
+
+def find_blink_rois(var, scale, count=2):
+    """De `count` sterkst knipperende gebieden (Otsu op de std-map + connected components), in volle-resolutie x,y,w,h."""
+    std = np.sqrt(var)
+    u8 = cv2.normalize(std, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+    _, mask = cv2.threshold(u8, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((3,3), np.uint8))
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(mask)
+    score = np.bincount(labels.ravel(), weights=std.ravel(), minlength=n)
+    score[0] = 0  # achtergrond
+    top = [k for k in np.argsort(score)[::-1][:count] if score[k] > 0]
+    if len(top) < count:
+        raise SystemExit(f"auto-roi: found {len(top)} blinking region(s), need {count}")
+    return [(int(x/scale), int(y/scale), max(1, int(round(w/scale))), max(1, int(round(h/scale))))
+            for x, y, w, h, _ in stats[top]]
+
+def lead_lag(a, b, max_lag):
+    """Lag (frames) met maximale kruiscorrelatie: > 0 betekent dat a voorloopt op b."""
+    a = (a - a.mean()) / (a.std() or 1.0)
+    b = (b - b.mean()) / (b.std() or 1.0)
+    n = 1 << int(np.ceil(np.log2(2 * len(a))))
+    xc = np.fft.irfft(np.conj(np.fft.rfft(a, n)) * np.fft.rfft(b, n), n)
+    lags = np.concatenate([np.arange(0, max_lag + 1), np.arange(-max_lag, 0)])
+    vals = np.concatenate([xc[:max_lag + 1], xc[n - max_lag:]])
+    return int(lags[np.argmax(vals)])
+
+def toggle_interval(lumas):
+    """Mediaan aantal frames tussen opeenvolgende overgangen (= halve knipperperiode), None bij < 2."""
+    idx, _ = find_edges(lumas, *auto_thresholds(lumas))
+    return float(np.median(np.diff(idx))) if len(idx) > 1 else None
+
+def auto_thresholds(lumas):
+    """Drempel halverwege donker/helder niveau (p5/p95) en hysterese 10% van dat bereik."""
+    lo, hi = np.percentile(lumas, [5, 95])
+    return (lo + hi) / 2, 0.1 * (hi - lo)
+
+def report(led_l, scr_l, fps, args, offset=None, thresholds=None):
+    """thresholds: optioneel [(drempel, hysterese) voor LED, idem scherm]; default --threshold/--hysteresis."""
+    offset = args.warmup if offset is None else offset
+    (lt, lh), (st, sh) = thresholds or [(args.threshold, args.hysteresis)] * 2
+    pairs = pair_edges(find_edges(led_l, lt, lh), find_edges(scr_l, st, sh))
+    if not pairs:
+        print(f"no transition pairs detected (frames={len(led_l)}); check ROI/--threshold")
+        return []
+    lat = np.array([(s - l) / fps * 1000.0 for l, s, _ in pairs])
+    for (l, s, pol), ms in zip(pairs, lat):
+        print(f"{'on ' if pol > 0 else 'off'} led_frame={l+offset} screen_frame={s+offset} delta_frames={s-l} latency_ms={ms:.2f}")
+    print(f"toggles={len(lat)} fps={fps:.2f} latency_ms_median={np.median(lat):.2f} p95={np.percentile(lat, 95):.2f} "
+          f"min={lat.min():.2f} max={lat.max():.2f}")
+    return lat.tolist()
+
+# ---------------------------------------------------------------------------
+# Live modus: camera -> capture thread -> ring buffer -> ROI luma -> rolling latency
+
+class FrameRing:
+    """Capture thread die frames in een vooraf gealloceerde ring schrijft (cap.read in een bestaand slot).
+    Is de ring vol, dan wordt het nieuwe frame alleen gegrabd en als 'dropped' geteld."""
+    def __init__(self, cap, slots=16):
+        ok, first = cap.read()
+        if not ok:
+            raise SystemExit("camera levert geen frames")
+        self.cap = cap
+        self.frames = np.empty((slots,) + first.shape, first.dtype)
+        self.ts = np.zeros(slots)
+        self.slots = slots
+        self.head = 0      # aantal geschreven frames (alleen capture thread)
+        self.tail = 0      # aantal verwerkte frames (alleen consumer)
+        self.dropped = 0
+        self.running = True
+        self.cv = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while self.running:
+            if self.head - self.tail >= self.slots:
+                self.cap.grab(); self.dropped += 1
+                continue
+            slot = self.head % self.slots
+            ok, _ = self.cap.read(self.frames[slot])
+            t = time.perf_counter()
+            if not ok:
+                self.running = False
+                break
+            self.ts[slot] = t
+            with self.cv:
+                self.head += 1
+                self.cv.notify()
+        with self.cv:
+            self.cv.notify()
+
+    def next(self, timeout=1.0):
+        """(frame view, timestamp) van het oudste onverwerkte frame, of None."""
+        with self.cv:
+            while self.tail == self.head and self.running:
+                self.cv.wait(timeout)
+            if self.tail == self.head:
+                return None
+        slot = self.tail % self.slots
+        return self.frames[slot], self.ts[slot]
+
+    def release(self):
+        self.tail += 1
+
+class EdgeTracker:
+    """Incrementele versie van find_edges: update(luma) -> +1 (aan), -1 (uit) of 0."""
+    __slots__ = ("thresh", "hyst", "on")
+    def __init__(self, thresh, hyst):
+        self.thresh, self.hyst, self.on = thresh, hyst, False
+    def update(self, l):
+        if not self.on and l >= self.thresh:
+            self.on = True; return 1
+        if self.on and l < self.thresh - self.hyst:
+            self.on = False; return -1
+        return 0
+
+class BlinkDriver:
+    """Stuurt de ESP32 (led_latency_tester.ino) over serial en timestampt elk commando.
+    hz > 0: zelf togglen met '0' (aan, active-low) / '1' (uit); hz == 0: 'B' (ESP knippert zelf)."""
+    def __init__(self, port, hz=0.0, baud=115200):
+        import serial
+        self.ser = serial.Serial(port, baud, timeout=0)
+        self.hz = hz
+        self.cmds = collections.deque(maxlen=64)   # (t_send, polarity)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def send(self, cmd, pol=0):
+        t = time.perf_counter()
+        self.ser.write(cmd); self.ser.flush()
+        if pol: self.cmds.append((t, pol))
+
+    def _run(self):
+        if self.hz <= 0:
+            self.send(b"B")
+            return
+        half = 0.5 / self.hz
+        on = False
+        t_next = time.perf_counter()
+        while self.running:
+            on = not on
+            self.send(b"0" if on else b"1", 1 if on else -1)
+            t_next += half
+            time.sleep(max(0.0, t_next - time.perf_counter()))
+
+    def command_before(self, t, pol, window):
+        for tc, p in reversed(self.cmds):
+            if p == pol and t - window <= tc <= t:
+                return tc
+        return None
+
+    def close(self):
+        self.running = False
+        self.ser.write(b"S" if self.hz <= 0 else b"1")
+        self.ser.close()
+
+def live(args):
+    cap = cv2.VideoCapture(int(args.live) if str(args.live).isdigit() else args.live)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open camera: {args.live}")
+    if args.width and args.height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width); cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
+    if args.fps:
+        cap.set(cv2.CAP_PROP_FPS, args.fps)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if not (args.led_roi and args.scr_roi):
+        raise SystemExit("live mode needs --led-roi and --scr-roi")
+    (lx,ly,lw,lh), (sx,sy,sw,sh) = args.led_roi, args.scr_roi
+    ring = FrameRing(cap, args.ring)
+    driver = BlinkDriver(args.serial, args.blink_hz) if args.serial else None
+    led_t, scr_t = EdgeTracker(args.threshold, args.hysteresis), EdgeTracker(args.threshold, args.hysteresis)
+    pending = {1: collections.deque(), -1: collections.deque()}
+    lat = collections.deque(maxlen=args.window)
+    cmd_lat = collections.deque(maxlen=args.window)
+    max_lat = args.max_latency / 1000.0
+    w_b, w_g, w_r = 0.114, 0.587, 0.299
+    frames = 0
+    t0 = time.perf_counter(); t_report = t0 + args.report
+    ring.thread.start()
+    if driver: driver.thread.start()
+    try:
+        while True:
+            item = ring.next()
+            if item is None: break
+            frame, ts = item
+            # per frame geen numpy-temporaries: cv2.mean op views van het ring-slot
+            b, g, r, _ = cv2.mean(frame[ly:ly+lh, lx:lx+lw])
+            e_led = led_t.update(w_b*b + w_g*g + w_r*r)
+            b, g, r, _ = cv2.mean(frame[sy:sy+sh, sx:sx+sw])
+            e_scr = scr_t.update(w_b*b + w_g*g + w_r*r)
+            ring.release()
+            frames += 1
+            if e_led:
+                pending[e_led].append(ts)
+                if driver:
+                    tc = driver.command_before(ts, e_led, max_lat)
+                    if tc is not None: cmd_lat.append((ts - tc) * 1000.0)
+            if e_scr:
+                q = pending[e_scr]
+                while q and q[0] < ts - max_lat: q.popleft()
+                if q: lat.append((ts - q.popleft()) * 1000.0)
+            if ts >= t_report:
+                live_status(ts - t0, frames, ring.dropped, lat, cmd_lat)
+                t_report += args.report
+            if args.duration and ts - t0 >= args.duration: break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.running = False
+        if driver: driver.close()
+        ring.thread.join(timeout=1.0)
+        cap.release()
+    live_status(time.perf_counter() - t0, frames, ring.dropped, lat, cmd_lat)
+
+def live_status(elapsed, frames, dropped, lat, cmd_lat):
+    line = f"t={elapsed:.1f}s frames={frames} fps={frames/max(elapsed, 1e-9):.1f} dropped={dropped} toggles={len(lat)}"
+    if lat:
+        a = np.fromiter(lat, float)
+        line += f" latency_ms_median={np.median(a):.2f} p95={np.percentile(a, 95):.2f}"
+    if cmd_lat:
+        c = np.fromiter(cmd_lat, float)
+        line += f" cmd_to_led_ms_median={np.median(c):.2f}"
+    print(line, flush=True)
 
 def main(args):
+    if args.live is not None:
+        return live(args)
+    if not args.video:
+        raise SystemExit("provide --video or --live")
     cap = cv2.VideoCapture(args.video)
     if not cap.isOpened():
         raise SystemExit(f"Cannot open video: {args.video}")
     fps = cap.get(cv2.CAP_PROP_FPS)
-    if not fps or fps <= 1:
-        if not args.fps:
-            raise SystemExit("Video FPS unknown; provide --fps")
+    if args.fps:
         fps = args.fps
-    # Read whole video into frames? No, we do two passes by reopening.
-    # Pass 1: LED ROI
-    cap1 = cv2.VideoCapture(args.video); cap2 = cv2.VideoCapture(args.video)
-    led_idx, _ = detect_first_on(cap1, args.led_roi, args.threshold, warm=args.warmup)
-    scr_idx, _ = detect_first_on(cap2, args.scr_roi, args.threshold, warm=args.warmup)
-    cap1.release(); cap2.release()
-
-    if led_idx < 0 or scr_idx < 0:
-        print(f"no transition detected. led_idx={led_idx}, scr_idx={scr_idx}")
-        return
-    delta_frames = scr_idx - led_idx
-    delta_ms = (delta_frames / fps) * 1000.0
-    print(f"led_frame={led_idx} screen_frame={scr_idx} delta_frames={delta_frames} fps={fps:.2f} latency_ms={delta_ms:.2f}")
+    elif not fps or fps <= 1:
+        raise SystemExit("Video FPS unknown; provide --fps")
+    if args.auto_roi:
+        rois = find_blink_rois(variance_map(args.video, args.auto_scale, args.auto_stride, args.warmup), args.auto_scale)
+    elif args.led_roi and args.scr_roi:
+        rois = [args.led_roi, args.scr_roi]
+    else:
+        raise SystemExit("provide --led-roi and --scr-roi, or --auto-roi")
+    if args.workers > 1 or args.fast:
+        cap.release()
+        led_l, scr_l = roi_lumas_parallel(args.video, rois, args.workers, args.fast, args.lowres, warm=args.warmup)
+    else:
+        # Eén pass: beide ROI's per frame
+        led_l, scr_l = roi_lumas(cap, rois, warm=args.warmup)
+        cap.release()
+    thresholds = None
+    if args.auto_roi:
+        # de LED loopt voor op het scherm: wissel als regio 2 voorloopt
+        # venster < één toggle-interval, anders is +d niet te onderscheiden van d - blinkperiode
+        half = [t for t in (toggle_interval(led_l), toggle_interval(scr_l)) if t]
+        lag = lead_lag(led_l, scr_l, max(1, int(np.ceil(min(half))) - 1) if half else int(fps))
+        if lag < 0:
+            rois.reverse(); led_l, scr_l = scr_l, led_l; lag = -lag
+        print(f"auto-roi: led_roi={','.join(map(str, rois[0]))} scr_roi={','.join(map(str, rois[1]))} lag_frames={lag}")
+        thresholds = [auto_thresholds(led_l), auto_thresholds(scr_l)]
+    report(led_l, scr_l, fps, args, thresholds=thresholds)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--video", required=True, help="pad naar hs-opname (mp4/mov)")
-    ap.add_argument("--led-roi", type=parse_roi, required=True, help="x,y,w,h rondom fysieke LED")
-    ap.add_argument("--scr-roi", type=parse_roi, required=True, help="x,y,w,h rondom LED op het scherm")
+    ap.add_argument("--video", help="pad naar hs-opname (mp4/mov)")
+    ap.add_argument("--live", default=None, help="live meten: camera index of /dev/videoX (i.p.v. --video)")
+    ap.add_argument("--led-roi", type=parse_roi, help="x,y,w,h rondom fysieke LED")
+    ap.add_argument("--scr-roi", type=parse_roi, help="x,y,w,h rondom LED op het scherm")
+    ap.add_argument("--auto-roi", action="store_true", help="vind LED en scherm-ROI zelf (temporele variantie) + automatische drempels")
+    ap.add_argument("--auto-scale", type=float, default=0.25, help="verkleining voor de variantie-pass")
+    ap.add_argument("--auto-stride", type=int, default=1, help="elke N-de frame gebruiken voor de variantie-pass")
     ap.add_argument("--threshold", type=float, default=200.0, help="luma drempel voor 'aan' (0..255)")
     ap.add_argument("--fps", type=float, default=0.0, help="overschrijf fps als container onjuist is")
     ap.add_argument("--warmup", type=int, default=5, help="frames overslaan aan het begin")
+    ap.add_argument("--workers", type=int, default=1, help="parallel decoderen over N processen (keyframe-uitgelijnde stukken)")
+    ap.add_argument("--fast", action="store_true", help="PyAV grijs-decode: alleen luma, geen BGR-conversie")
+    ap.add_argument("--lowres", type=int, default=0, choices=[0,1,2,3], help="met --fast: decoder 'lowres' (1/2^N resolutie, o.a. MJPEG) als de ROI's groot genoeg zijn")
+    ap.add_argument("--hysteresis", type=float, default=10.0, help="luma marge onder de drempel voor 'uit' (tegen flikkeren)")
+    live_ap = ap.add_argument_group("live")
+    live_ap.add_argument("--serial", default=None, help="ESP32 poort (led_latency_tester.ino) om zelf te laten knipperen")
+    live_ap.add_argument("--blink-hz", type=float, default=0.0, help="0 = ESP knippert zelf ('B'); >0 = host togglet met '0'/'1' en timestampt")
+    live_ap.add_argument("--width", type=int, default=0)
+    live_ap.add_argument("--height", type=int, default=0)
+    live_ap.add_argument("--ring", type=int, default=16, help="aantal frame-slots in de ring buffer")
+    live_ap.add_argument("--window", type=int, default=500, help="rolling venster (aantal toggles)")
+    live_ap.add_argument("--report", type=float, default=2.0, help="status elke N seconden")
+    live_ap.add_argument("--duration", type=float, default=0.0, help="stop na N seconden (0 = Ctrl-C)")
+    live_ap.add_argument("--max-latency", type=float, default=1000.0, help="ms; oudere LED-overgangen worden niet meer gekoppeld")
     args = ap.parse_args()
     main(args)
@@ -1,71 +1,199 @@
 #!/usr/bin/env python3
 """
-webrtc_echo.py — Local loopback met aiortc, meet encode->decode latency in software.
-Gebruik als baseline zonder netwerk; voor Jetson+browser end-to-end gebruik je WebRTC app + webrtc_stats.html.
+webrtc_echo.py — Local loopback met aiortc, meet send->receive latency per frame in software.
+Gebruik als baseline zonder netwerk (regressie voor encoder/jitter-buffer instellingen); voor
+Jetson+browser end-to-end gebruik je WebRTC app + webrtc_stats.html.
+
+Elk TestPattern-frame krijgt een binaire pixel-barcode (24-bit framenummer + 8-bit check) in de
+bovenste rij blokken. De ontvangende peer decodeert die, zodat per frame de tijd van overdracht
+aan de encoder tot het gedecodeerde frame gemeten wordt (encode + RTP + jitter buffer + decode).
+Met meerdere waarden per optie draait een matrix over resolutie, fps, codec en bitrate; per
+configuratie komen percentielen in JSON (--out).
 
 Benodigd:
   pip install aiortc opencv-python
 
 Gebruik:
   python tools/webrtc_echo.py --fps 30 --duration 10
+  python tools/webrtc_echo.py --res 640x480,1280x720 --fps 30,60 --codec vp8,h264 --bitrate 1000,4000 --out echo.json
 """
-import argparse, asyncio, time
-from aiortc import RTCPeerConnection, VideoStreamTrack
-from aiortc.contrib.media import MediaBlackhole
+import argparse, asyncio, itertools, json, time
+from aiortc import RTCPeerConnection, RTCRtpSender, VideoStreamTrack
+from aiortc.mediastreams import MediaStreamError, VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
+import aiortc.codecs.h264, aiortc.codecs.vpx
 import numpy as np, cv2
 from av import VideoFrame
+from latency_hist import Histogram
+
+BITS = 32
+MIME = {"vp8": "video/VP8", "h264": "video/H264"}
+PERCENTILES = (50, 90, 95, 99)
+
+def check_byte(seq):
+    return (seq ^ (seq >> 8) ^ (seq >> 16)) & 0xFF
+
+def cell_size(width):
+    return max(4, width // (BITS + 2))
+
+def draw_barcode(img, seq):
+    """Zwart/wit blokken van cell x cell pixels, één per bit, op rij 1 (met marge van één blok)."""
+    c = cell_size(img.shape[1])
+    word = (seq & 0xFFFFFF) | (check_byte(seq & 0xFFFFFF) << 24)
+    img[:3 * c, :(BITS + 2) * c] = 0
+    for i in range(BITS):
+        if word >> i & 1:
+            img[c:2 * c, (i + 1) * c:(i + 2) * c] = 255
+
+def read_barcode(gray):
+    """Framenummer uit een grijswaardenbeeld, of None als de check niet klopt."""
+    c = cell_size(gray.shape[1])
+    q = max(1, c // 4)
+    y = c + c // 2
+    word = 0
+    for i in range(BITS):
+        x = (i + 1) * c + c // 2
+        if gray[y - q:y + q, x - q:x + q].mean() > 128:
+            word |= 1 << i
+    seq = word & 0xFFFFFF
+    return seq if word >> 24 == check_byte(seq) else None
 
 class TestPattern(VideoStreamTrack):
-    def __init__(self, fps):
+    def __init__(self, fps, width=640, height=480):
         super().__init__()
         self.fps = fps
-        self.ts = 0
+        self.width, self.height = width, height
+        self.seq = 0
+        self.sent = {}          # seq -> perf_counter bij overdracht aan de encoder
         self.start = time.time()
 
+    async def next_timestamp(self):
+        # één pacing-klok op self.fps (aiortc's eigen versie staat vast op 30 fps)
+        if self.readyState != "live":
+            raise MediaStreamError
+        if hasattr(self, "_timestamp"):
+            self._timestamp += int(VIDEO_CLOCK_RATE / self.fps)
+            wait = self._start + (self._timestamp / VIDEO_CLOCK_RATE) - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        else:
+            self._start = time.time()
+            self._timestamp = 0
+        return self._timestamp, VIDEO_TIME_BASE
+
     async def recv(self):
         pts, time_base = await self.next_timestamp()
-        # Create simple frame with timestamp text
-        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        # Create simple frame with timestamp text + barcode
+        img = np.zeros((self.height, self.width, 3), dtype=np.uint8)
         ms = int((time.time() - self.start) * 1000)
-        cv2.putText(img, f"{ms} ms", (50, 240), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255,255,255), 2)
+        cv2.putText(img, f"{ms} ms", (50, self.height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255,255,255), 2)
+        self.seq += 1
+        draw_barcode(img, self.seq)
         frame = VideoFrame.from_ndarray(img, format="bgr24")
         frame.pts = pts
         frame.time_base = time_base
-        await asyncio.sleep(1.0/self.fps)
+        self.sent[self.seq & 0xFFFFFF] = time.perf_counter()
         return frame
 
-async def main(args):
+def set_bitrate(bps):
+    """aiortc past de bitrate aan op REMB; vastpinnen door min = default = max."""
+    for mod in (aiortc.codecs.vpx, aiortc.codecs.h264):
+        mod.MIN_BITRATE = mod.DEFAULT_BITRATE = mod.MAX_BITRATE = int(bps)
+
+async def run_config(width, height, fps, codec, kbps, duration, warmup):
+    set_bitrate(kbps * 1000)
     pc1 = RTCPeerConnection()
     pc2 = RTCPeerConnection()
+    src = TestPattern(fps, width, height)
+    sender = pc1.addTrack(src)
+    codecs = [c for c in RTCRtpSender.getCapabilities("video").codecs if c.mimeType == MIME[codec]]
+    next(t for t in pc1.getTransceivers() if t.sender is sender).setCodecPreferences(codecs)
 
-    src = TestPattern(args.fps)
-    pc1.addTrack(src)
+    hist = Histogram()
+    counts = {"received": 0, "unreadable": 0, "duplicates": 0}
+    seen = set()
+    t_measure = time.perf_counter() + warmup
 
-    # Pipe pc1 -> pc2
+    async def consume(track):
+        while True:
+            try:
+                frame = await track.recv()
+            except MediaStreamError:
+                return
+            t = time.perf_counter()
+            seq = read_barcode(frame.to_ndarray(format="gray"))
+            if seq is not None and src.sent.get(seq, 0) < t_measure:
+                continue    # warmup
+            counts["received"] += 1
+            if seq is None or seq not in src.sent:
+                counts["unreadable"] += 1
+            elif seq in seen:
+                counts["duplicates"] += 1
+            else:
+                seen.add(seq)
+                hist.record((t - src.sent[seq]) * 1000.0)
+
+    tasks = []
     @pc2.on("track")
     def on_track(track):
-        # Sink frames to blackhole, but we measure timing via RTCPeerConnection stats
-        pass
+        tasks.append(asyncio.ensure_future(consume(track)))
 
     await pc1.setLocalDescription(await pc1.createOffer())
     await pc2.setRemoteDescription(pc1.localDescription)
     await pc2.setLocalDescription(await pc2.createAnswer())
     await pc1.setRemoteDescription(pc2.localDescription)
 
-    # Wait some seconds and pull stats
-    await asyncio.sleep(args.duration)
+    await asyncio.sleep(warmup + duration)
     stats = await pc2.getStats()
-    # Estimate decode latency: totalDecodeTime / framesDecoded
+    # Estimate decode latency: totalDecodeTime / framesDecoded (niet elke aiortc-versie vult dit)
     decode_ms = None
     for s in stats.values():
         if s.type == "inbound-rtp" and getattr(s, "kind", None) == "video":
             if getattr(s, "totalDecodeTime", None) and getattr(s, "framesDecoded", 0):
                 decode_ms = 1000.0 * (s.totalDecodeTime / max(1, s.framesDecoded))
-    print(f"aiortc local loopback: estimated decode_ms={decode_ms:.2f} (software)")
+    await pc1.close()
+    await pc2.close()
+    for t in tasks: t.cancel()
+
+    # frames van de laatste halve seconde kunnen nog onderweg zijn geweest: niet als verloren tellen
+    t_end = max(src.sent.values(), default=t_measure) - 0.5
+    window = [q for q, t in src.sent.items() if t_measure <= t <= t_end]
+    res = {"res": f"{width}x{height}", "fps": fps, "codec": codec, "kbps": kbps,
+           "frames_sent": len(window), "frames_measured": hist.count, **counts,
+           "lost": sum(1 for q in window if q not in seen),
+           "decode_ms": None if decode_ms is None else round(decode_ms, 3)}
+    if hist.count:
+        res.update({"mean_ms": round(hist.mean(), 3), "min_ms": round(hist.percentile(0), 3),
+                    "max_ms": round(hist.percentile(100), 3)})
+        res.update({f"p{p}_ms": round(hist.percentile(p), 3) for p in PERCENTILES})
+    return res
+
+def fmt(r):
+    lat = (f"p50={r['p50_ms']:.2f} p95={r['p95_ms']:.2f} p99={r['p99_ms']:.2f} max={r['max_ms']:.2f}"
+           if r["frames_measured"] else "no frames decoded")
+    dec = "n/a" if r["decode_ms"] is None else f"{r['decode_ms']:.2f}"
+    return (f"{r['res']:>9} {r['fps']:>3}fps {r['codec']:<4} {r['kbps']:>6g}kbps  send->recv_ms {lat}  "
+            f"decode_ms={dec} frames={r['frames_measured']} lost={r['lost']} unreadable={r['unreadable']}")
+
+async def main(args):
+    results = []
+    for res, fps, codec, kbps in itertools.product(args.res.split(","), [int(x) for x in args.fps.split(",")],
+                                                   args.codec.split(","), [float(x) for x in args.bitrate.split(",")]):
+        w, h = (int(x) for x in res.split("x"))
+        r = await run_config(w, h, fps, codec, kbps, args.duration, args.warmup)
+        print(fmt(r), flush=True)
+        results.append(r)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"tool": "webrtc_echo", "duration_s": args.duration, "configs": results}, f, indent=2)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("--fps", type=int, default=30)
-    ap.add_argument("--duration", type=int, default=10)
+    ap.add_argument("--res", default="640x480", help="komma-gescheiden BxH")
+    ap.add_argument("--fps", default="30", help="komma-gescheiden")
+    ap.add_argument("--codec", default="vp8", help="vp8,h264")
+    ap.add_argument("--bitrate", default="1000", help="kbps, komma-gescheiden")
+    ap.add_argument("--duration", type=float, default=10, help="meetduur per configuratie (s)")
+    ap.add_argument("--warmup", type=float, default=2, help="s per configuratie niet meegeteld (ICE, keyframe)")
+    ap.add_argument("--out", default=None, help="JSON met percentielen per configuratie")
     args = ap.parse_args()
     asyncio.run(main(args))